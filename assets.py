@@ -0,0 +1,134 @@
+"""
+Module for the shared image asset cache. Images are
+loaded & converted once and the same Surface is handed
+to every object that asks for it, so spawning thousands
+of objects doesn't decode (or store) the same image
+thousands of times
+
+Surfaces handed out are shared: draw with them, but
+never draw onto them
+"""
+import sys
+from collections import OrderedDict
+import pygame as pyg
+import constants as con
+
+class AssetCache(object):
+    """
+    Least-recently-used cache of converted Surfaces, keyed
+    by file path (or placeholder size & color). Once the
+    cached pixel data passes the byte budget, the least
+    recently used entries that no object still holds are
+    evicted
+    """
+    def __init__(self, max_bytes=con.ASSET_CACHE_BYTES):
+        """
+        Creates an empty cache holding at most about
+        max_bytes of pixel data in unused entries
+        """
+        self.max_bytes = max_bytes
+
+        # Cached Surfaces, least recently used first
+        self.entries = OrderedDict()
+
+        # Stats: lookups served from the cache, lookups that
+        #   had to load/build a Surface, entries evicted and
+        #   pixel bytes currently cached
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    def image(self, path, alpha=True):
+        """
+        Returns the shared Surface for the image at path,
+        converted for fast blitting (with per-pixel alpha
+        unless alpha is False). Requires a display mode
+        """
+        key = (path, alpha)
+        surface = self.lookup(key)
+        if surface is None:
+            surface = pyg.image.load(path)
+            surface = surface.convert_alpha() if alpha else surface.convert()
+            self.store(key, surface)
+        return surface
+
+    def placeholder(self, size, color):
+        """
+        Returns a shared Surface of the given size filled
+        with color
+        """
+        key = ("placeholder", tuple(size), tuple(color))
+        surface = self.lookup(key)
+        if surface is None:
+            surface = pyg.Surface(size)
+            surface.fill(color)
+            self.store(key, surface)
+        return surface
+
+    def lookup(self, key):
+        """
+        Returns the Surface cached under key (marking it most
+        recently used), or None on a miss
+        """
+        surface = self.entries.pop(key, None)
+        if surface is None:
+            self.misses += 1
+            return None
+        self.entries[key] = surface
+        self.hits += 1
+        return surface
+
+    def store(self, key, surface):
+        """
+        Caches surface under key, then evicts unused entries
+        while over budget
+        """
+        self.entries[key] = surface
+        self.bytes += surface_bytes(surface)
+        if self.bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops least recently used entries that nothing else
+        references until the cache is back under budget
+        (entries still in use are kept, since dropping them
+        would free no memory, and so is the newest one,
+        which is about to be handed out)
+        """
+        for key in list(self.entries)[:-1]:
+            if self.bytes <= self.max_bytes:
+                break
+            # Unused entries are referenced only by the cache
+            #   & the argument to getrefcount()
+            if sys.getrefcount(self.entries[key]) > 2:
+                continue
+            surface = self.entries.pop(key)
+            self.bytes -= surface_bytes(surface)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Drops every entry (stats are kept)
+        """
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """
+        Returns a dict of cache counters: hits, misses,
+        evictions, entries and cached bytes
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.entries),
+                "bytes": self.bytes}
+
+def surface_bytes(surface):
+    """
+    Returns the size of a Surface's pixel buffer in bytes
+    """
+    return surface.get_pitch() * surface.get_height()
+
+# Cache shared by every game object
+cache = AssetCache()
@@ -0,0 +1,293 @@
+"""
+Benchmark harness for stage update & render throughput.
+Builds PlayStage scenes of Balls in falling, resting and
+chaotic states, times PlayStage.update (and the
+apply_gravity & detect_collisions steps inside it, the
+latter being where clsn_predict runs) and PlayStage.draw
+under SDL's dummy video driver, and writes percentiles
+to a JSON file. A stored results file can be given as
+a baseline to flag regressions
+
+Run python bench.py --help for options
+"""
+import os
+import sys
+import json
+import random
+import types
+import argparse
+import collections
+from timeit import default_timer
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame as pyg
+import constants as con
+from objects import Ball
+from physics import PhysicsEngine
+from stage import PlayStage, TESTSTAGE, SLEEP_FRAMES
+
+# Ball counts & scene kinds benchmarked by default
+SIZES = (10, 100, 1000, 10000, 100000)
+SCENES = ("falling", "resting", "chaotic")
+
+# Timed steps (phases) of every frame
+PHASES = ("update", "apply_gravity", "clsn_predict", "draw")
+
+# Most untimed updates the resting scene runs before its
+#   warmup while waiting for every ball to fall asleep
+#   (balls stacked in rows take longer than SLEEP_FRAMES
+#   updates to settle)
+SETTLE_LIMIT = 10 * SLEEP_FRAMES
+
+# Percentiles reported for every phase
+PERCENTILES = (50, 90, 99)
+
+# Largest fraction of a scene's stage area covered by
+#   balls: stages bigger than TESTSTAGE are used for
+#   counts that would not fit it at this density
+MAX_FILL = 0.5
+
+def scene_bounds(count, size):
+    """
+    Returns TESTSTAGE, with its right wall & floor pushed
+    out if count balls of the given size would cover more
+    than MAX_FILL of it
+    """
+    bounds = dict(TESTSTAGE)
+    width = bounds["RIGHT_WALL"] - bounds["LEFT_WALL"]
+    height = bounds["FLOOR"] - bounds["CEILING"]
+    scale = max(1.0, np.sqrt(count * size[0] * size[1] / (MAX_FILL * width * height)))
+    bounds["RIGHT_WALL"] = bounds["LEFT_WALL"] + int(width * scale)
+    bounds["FLOOR"] = bounds["CEILING"] + int(height * scale)
+    return bounds
+
+def build_scene(kind, count, vectorized, seed=0):
+    """
+    Returns a PlayStage with count Balls in one of the
+    SCENES states: falling from rest at random spots,
+    resting packed in rows on the floor (motionless, so
+    they fall asleep), or flying around at random speeds
+    """
+    rng = random.Random(seed)
+    size = pyg.image.load("img/ball.png").get_size()
+    bounds = scene_bounds(count, size)
+    stage = PlayStage(bounds, vectorized)
+    left, right = bounds["LEFT_WALL"], bounds["RIGHT_WALL"]
+    top, bottom = bounds["CEILING"], bounds["FLOOR"]
+    columns = (right - left) // size[0]
+    for i in xrange(count):
+        if kind == "resting":
+            ball = Ball(stage, left + (i % columns) * size[0],
+                        bottom - (i // columns + 1) * size[1])
+            ball.deltaX = 0
+            ball.deltaY = 0
+            ball.can_bounce = False
+        else:
+            ball = Ball(stage, rng.randint(left, right - size[0]),
+                        rng.randint(top, bottom - size[1]))
+            if kind == "chaotic":
+                ball.deltaX = rng.uniform(-8, 8)
+                ball.deltaY = rng.uniform(-8, 8)
+            else:
+                ball.deltaX = 0
+        stage.add_object(ball)
+    return stage
+
+def settle_scene(stage, limit):
+    """
+    Runs untimed updates until every object of stage is
+    asleep, or limit updates have run. Returns how many
+    ran
+    """
+    count = len(stage.objects)
+    frames = 0
+    while frames < limit and not stage.asleep[:count].all():
+        stage.update()
+        frames += 1
+    return frames
+
+def timed(times, phase, method):
+    """
+    Wraps a bound method so every call adds its duration
+    to times[phase]
+    """
+    def wrapper(*args, **kwargs):
+        start = default_timer()
+        result = method(*args, **kwargs)
+        times[phase][-1] += default_timer() - start
+        return result
+    return wrapper
+
+def run_scene(stage, screen, frames, warmup):
+    """
+    Runs warmup untimed frames, then frames timed ones.
+    Returns a dict of per-frame durations (ms) by phase
+    """
+    times = dict((phase, [0.0]) for phase in PHASES)
+    stage.apply_gravity = timed(times, "apply_gravity", stage.apply_gravity)
+    stage.detect_collisions = timed(times, "clsn_predict", stage.detect_collisions)
+    for frame in xrange(warmup + frames):
+        for phase in PHASES:
+            times[phase].append(0.0)
+        start = default_timer()
+        stage.update()
+        times["update"][-1] = default_timer() - start
+        start = default_timer()
+        stage.draw(screen)
+        times["draw"][-1] = default_timer() - start
+    return dict((phase, np.array(times[phase][1 + warmup:]) * 1000.0) for phase in PHASES)
+
+def summarize(samples):
+    """
+    Returns the mean, max & PERCENTILES of a phase's
+    per-frame durations
+    """
+    summary = {"mean": float(samples.mean()), "max": float(samples.max())}
+    for p in PERCENTILES:
+        summary["p%d" % p] = float(np.percentile(samples, p))
+    return summary
+
+def run(sizes, scenes, frames, warmup, vectorized, log=sys.stdout):
+    """
+    Benchmarks every scene at every size. Returns the
+    results as a dict keyed by "scene/count"
+    """
+    screen = pyg.display.set_mode(con.SCREEN_SIZE)
+    results = {}
+    for count in sizes:
+        for kind in scenes:
+            stage = build_scene(kind, count, vectorized)
+
+            if kind == "resting":
+                settle_scene(stage, SETTLE_LIMIT)
+            samples = run_scene(stage, screen, frames, warmup)
+            key = "%s/%d" % (kind, count)
+            results[key] = dict((phase, summarize(samples[phase])) for phase in PHASES)
+            print >>log, "%-16s" % key + "".join(
+                "  %s p50 %8.3f ms" % (phase, results[key][phase]["p50"]) for phase in PHASES)
+    return results
+
+def owned_size(value, seen, sizes):
+    """
+    Adds the bytes taken by value and everything it
+    references that isn't shared between objects (stages,
+    engines, Surfaces, classes, modules and functions) to
+    sizes, by type name, skipping anything in seen
+    """
+    if id(value) in seen or isinstance(value, (PlayStage, PhysicsEngine, pyg.Surface, type,
+                                               types.ClassType, types.ModuleType,
+                                               types.FunctionType)):
+        return
+    seen.add(id(value))
+    name = type(value).__name__
+    sizes[name] = sizes.get(name, 0) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, collections.deque)):
+        members = list(value)
+    elif isinstance(value, dict):
+        members = value.keys() + value.values()
+    else:
+        members = []
+        if hasattr(value, "__dict__"):
+            members.append(value.__dict__)
+        for cls in type(value).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if hasattr(value, slot):
+                    members.append(getattr(value, slot))
+    for member in members:
+        owned_size(member, seen, sizes)
+
+def memory_report(count, vectorized, log=sys.stdout):
+    """
+    Prints the bytes each Ball of a falling scene of count
+    Balls takes after one update (once collisions have
+    been queued), by type of what it owns, plus its share
+    of the physics engine's arrays
+    """
+    pyg.display.set_mode(con.SCREEN_SIZE)
+    stage = build_scene("falling", count, vectorized)
+    stage.update()
+    sizes = {}
+    seen = set()
+    for ball in stage.objects:
+        owned_size(ball, seen, sizes)
+    print >>log, "Memory per Ball at %d Balls:" % count
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        print >>log, "  %-20s %10.1f bytes" % (name, float(size) / count)
+    total = float(sum(sizes.values())) / count
+    engine = stage.engine
+    if engine is not None:
+        arrays = sum(getattr(engine, name).nbytes
+                     for name in engine.FLOAT_FIELDS + engine.BOOL_FIELDS)
+        print >>log, "  %-20s %10.1f bytes" % ("engine arrays", float(arrays) / count)
+        total += float(arrays) / count
+    print >>log, "  %-20s %10.1f bytes" % ("total", total)
+
+def compare(results, baseline, tolerance, stat="p50"):
+    """
+    Returns (key, phase, baseline, result) for every phase
+    whose stat is more than tolerance (a fraction) slower
+    than in the baseline
+    """
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        for phase in PHASES:
+            old = baseline[key].get(phase, {}).get(stat)
+            new = results[key][phase][stat]
+            if old is not None and new > old * (1 + tolerance):
+                regressions.append((key, phase, old, new))
+    return regressions
+
+def main():
+    """
+    Parses options, runs the benchmarks and writes or
+    compares the results
+    """
+    parser = argparse.ArgumentParser(description="Stage update & render benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="ball counts (default: %s)" % " ".join(map(str, SIZES)))
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=SCENES)
+    parser.add_argument("--frames", type=int, default=30, help="timed frames per scene")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="untimed frames per scene (after the resting scene's balls "
+                             "have fallen asleep)")
+    parser.add_argument("--objects", action="store_true",
+                        help="step Balls one at a time instead of with the physics engine")
+    parser.add_argument("--no-debug", action="store_true",
+                        help="turn off con.DEBUG (prediction & collision rects)")
+    parser.add_argument("--output", default="bench.json", help="results file to write")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="flag phases slower than in this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown (fraction of baseline p50) counted as a regression")
+    parser.add_argument("--memory", type=int, metavar="COUNT",
+                        help="report the memory taken per Ball at COUNT Balls instead")
+    args = parser.parse_args()
+
+    if args.no_debug:
+        con.DEBUG = False
+    pyg.init()
+    if args.memory is not None:
+        memory_report(args.memory, not args.objects)
+        pyg.quit()
+        return
+    results = run(args.sizes, args.scenes, args.frames, args.warmup, not args.objects)
+    with open(args.output, "w") as output:
+        json.dump({"frames": args.frames, "vectorized": not args.objects, "debug": con.DEBUG,
+                   "results": results}, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)["results"], args.tolerance)
+        for key, phase, old, new in regressions:
+            print "REGRESSION %-16s %-13s p50 %8.3f ms -> %8.3f ms" % (key, phase, old, new)
+        if regressions:
+            sys.exit(1)
+        print "No regressions against", args.compare
+    pyg.quit()
+
+if __name__ == "__main__":
+    main()
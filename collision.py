@@ -0,0 +1,615 @@
+"""
+Module for collision detection between game objects.
+Includes a spatial hash broad phase that finds pairs
+of overlapping pushboxes without testing every pair,
+swept AABB time-of-impact tests (so fast objects can't
+tunnel through each other between updates), the
+impulse solver that resolves collisions, and batched
+queries over typed hitboxes
+"""
+import numpy as np
+import constants as con
+
+class SpatialHash(object):
+    """
+    Uniform grid broad phase. Every box is inserted into
+    each grid cell it covers, and only boxes sharing a
+    cell are tested against each other, which keeps the
+    cost near-linear in the number of boxes as long as
+    cells are not crowded
+    """
+    def __init__(self, cell_size=64):
+        """
+        Constructs a SpatialHash with square cells of the
+        given size (best kept around twice the size of a
+        typical box)
+        """
+        self.cell_size = cell_size
+
+        # Sorted cell keys & box indices from the last
+        #   rebuild, and the number of boxes inserted
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def cells(self, x, y, w, h, margin=0):
+        """
+        Returns (keys, boxes) arrays with one entry per grid
+        cell covered by each box (given as arrays of left,
+        top, width, height), growing each box's right &
+        bottom edges by margin
+        """
+        cell_size = float(self.cell_size)
+        n = len(x)
+        left = np.floor_divide(x, cell_size).astype(np.int64)
+        top = np.floor_divide(y, cell_size).astype(np.int64)
+        right = np.floor_divide(x + np.maximum(w - 1 + margin, 0), cell_size).astype(np.int64)
+        bottom = np.floor_divide(y + np.maximum(h - 1 + margin, 0), cell_size).astype(np.int64)
+
+        # Number of cells covered by each box
+        columns = right - left + 1
+        counts = columns * (bottom - top + 1)
+
+        # One entry per (box, covered cell)
+        boxes = np.repeat(np.arange(n, dtype=np.int64), counts)
+        offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        columns = np.repeat(columns, counts)
+        cell_x = np.repeat(left, counts) + offsets % columns
+        cell_y = np.repeat(top, counts) + offsets // columns
+        return cell_x * 4294967296 + cell_y, boxes
+
+    def rebuild(self, x, y, w, h, margin=0):
+        """
+        Re-inserts every box into the grid (see cells())
+        """
+        keys, boxes = self.cells(x, y, w, h, margin)
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.boxes = boxes[order]
+        self.count = len(x)
+
+    def query(self, x, y, w, h):
+        """
+        Returns the sorted indices of the boxes from the last
+        rebuild that share a cell with any of the given
+        query rects (a conservative overlap test)
+        """
+        keys, queries = self.cells(x, y, w, h)
+        hit = np.in1d(self.keys, keys)
+        return np.unique(self.boxes[hit])
+
+    def cross_pairs(self, x, y, w, h, margin=0):
+        """
+        Returns the (query, box) index pairs of the given
+        query boxes and the boxes from the last rebuild that
+        share a cell, each pair once
+        """
+        keys, queries = self.cells(x, y, w, h, margin)
+        start = np.searchsorted(self.keys, keys, "left")
+        counts = np.searchsorted(self.keys, keys, "right") - start
+        if not counts.sum():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        query = np.repeat(queries, counts)
+        box = self.boxes[np.repeat(start, counts) + offsets]
+        packed = np.unique(query * self.count + box)
+        return packed // self.count, packed % self.count
+
+    def pairs(self):
+        """
+        Returns (first, second) index arrays for every pair
+        of boxes sharing at least one cell, each pair
+        listed once with first < second
+        """
+        keys = self.keys
+        boxes = self.boxes
+        m = len(keys)
+        first = []
+        second = []
+
+        # Entries sharing a cell are adjacent once sorted, so
+        #   compare each entry with the one d places after it
+        #   for growing d, dropping entries whose cell run
+        #   has ended
+        index = np.arange(m - 1, dtype=np.int64)
+        d = 1
+        while len(index):
+            index = index[index + d < m]
+            index = index[keys[index] == keys[index + d]]
+            first.append(boxes[index])
+            second.append(boxes[index + d])
+            d += 1
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+
+        # Boxes covering several cells together show up once
+        #   per shared cell
+        low = np.minimum(first, second)
+        high = np.maximum(first, second)
+        packed = np.unique(low * len(keys) + high)
+        return packed // len(keys), packed % len(keys)
+
+    def overlapping_pairs(self, x, y, w, h):
+        """
+        Rebuilds the grid from the given boxes and returns
+        the candidate pairs whose boxes actually overlap
+        (same test as pygame.Rect.colliderect)
+        """
+        self.rebuild(x, y, w, h)
+        first, second = self.pairs()
+        overlap = ((x[first] < x[second] + w[second]) & (x[second] < x[first] + w[first]) &
+                   (y[first] < y[second] + h[second]) & (y[second] < y[first] + h[first]))
+        return first[overlap], second[overlap]
+
+    def contact_pairs(self, x, y, w, h):
+        """
+        Like overlapping_pairs(), but also returns boxes
+        resting edge to edge (not just corner to corner),
+        so objects stacked on each other stay in contact
+        """
+        self.rebuild(x, y, w, h, 1)
+        first, second = self.pairs()
+        contact = touching(first, second, x, y, w, h)
+        return first[contact], second[contact]
+
+    def swept_pairs(self, x, y, w, h, dx, dy):
+        """
+        Rebuilds the grid from the area each box sweeps
+        through while moving by (dx, dy), grown by a pixel
+        so touching boxes are included, and returns every
+        candidate pair
+        """
+        self.rebuild(np.minimum(x, x + dx), np.minimum(y, y + dy),
+                     w + np.ceil(np.abs(dx)), h + np.ceil(np.abs(dy)), 1)
+        return self.pairs()
+
+def islands(count, first, second):
+    """
+    Returns a label for each of count boxes such that boxes
+    linked by a chain of (first[k], second[k]) pairs share
+    the same label (the lowest index among them)
+    """
+    labels = np.arange(count)
+    while len(first):
+        # Hook the higher label of each linked pair onto the
+        #   lower one...
+        a = labels[first]
+        b = labels[second]
+        linked = a != b
+        if not linked.any():
+            break
+        np.minimum.at(labels, np.maximum(a, b)[linked], np.minimum(a, b)[linked])
+
+        # ...then follow labels to their own labels until
+        #   every box points straight at its root
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+    return labels
+
+def overlaps(first, second, x, y, w, h):
+    """
+    Returns how far each (first[k], second[k]) pair of
+    boxes overlaps along x and y (negative if apart)
+    """
+    overlap_x = np.minimum(x[first] + w[first], x[second] + w[second]) - np.maximum(x[first], x[second])
+    overlap_y = np.minimum(y[first] + h[first], y[second] + h[second]) - np.maximum(y[first], y[second])
+    return overlap_x, overlap_y
+
+def touching(first, second, x, y, w, h):
+    """
+    Returns a mask of the pairs whose boxes overlap or rest
+    edge to edge (corners meeting don't count)
+    """
+    overlap_x, overlap_y = overlaps(first, second, x, y, w, h)
+    return (overlap_x >= 0) & (overlap_y >= 0) & ((overlap_x > 0) | (overlap_y > 0))
+
+def sweep(first, second, x, y, w, h, dx, dy):
+    """
+    Swept AABB test for every (first[k], second[k]) pair
+    of boxes moving by (dx, dy) over one update. Returns
+    the time of impact as a fraction of the update (inf if
+    the boxes don't meet within it, 0 or less if they
+    already touch), whether they meet along the x axis,
+    the sign of the contact normal from first to second,
+    and whether the boxes would pass clean through each
+    other within the update (tunnel) if nothing stopped
+    them
+    """
+    # Work in first's frame of reference, with second
+    #   moving by the relative delta
+    speed_x = dx[second] - dx[first]
+    speed_y = dy[second] - dy[first]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        entry_x, exit_x = _slab(x[first], w[first], x[second], w[second], speed_x)
+        entry_y, exit_y = _slab(y[first], h[first], y[second], h[second], speed_y)
+    entry = np.maximum(entry_x, entry_y)
+    exit = np.minimum(exit_x, exit_y)
+    meet = (entry < exit) & (entry <= 1)
+    toi = np.where(meet, entry, np.inf)
+    along_x = entry_x > entry_y
+
+    # Normal points from first toward where second comes from
+    normal = np.where(along_x, -np.sign(speed_x), -np.sign(speed_y))
+    return toi, along_x, normal, meet & (exit < 1)
+
+def _slab(start_a, size_a, start_b, size_b, speed):
+    """
+    Entry & exit times of interval b (moving at speed)
+    into static interval a along one axis
+    """
+    moving = speed != 0
+    entry = np.where(speed > 0, (start_a - (start_b + size_b)) / speed,
+                     (start_a + size_a - start_b) / speed)
+    exit = np.where(speed > 0, (start_a + size_a - start_b) / speed,
+                    (start_a - (start_b + size_b)) / speed)
+
+    # Still intervals are either overlapping forever or never
+    overlapping = (start_b < start_a + size_a) & (start_a < start_b + size_b)
+    entry[~moving] = np.where(overlapping[~moving], -np.inf, np.inf)
+    exit[~moving] = np.where(overlapping[~moving], np.inf, -np.inf)
+    return entry, exit
+
+def boundary_toi(x, y, w, h, dx, dy, bounds, out):
+    """
+    Writes into out the fraction of an update after which
+    each box moving by (dx, dy) first reaches one of the
+    stage bounds (left, top, right, bottom), or inf if it
+    doesn't reach one within the update
+    """
+    left, top, right, bottom = bounds
+    out.fill(np.inf)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for distance, speed in ((left - x, dx), (right - (x + w), dx),
+                                (top - y, dy), (bottom - (y + h), dy)):
+            time = distance / speed
+            hit = (time >= 0) & (time <= 1) & (np.sign(distance) == np.sign(speed))
+            np.minimum(out, np.where(hit, time, np.inf), out=out)
+    return out
+
+class ImpulseSolver(object):
+    """
+    Narrow phase & response for queued collisions. Works on
+    a whole batch of contacts at once: applies elastic
+    impulses (decayed by the bodies' proration, like a
+    bounce off the floor) and then pushes overlapping
+    pushboxes apart, each over a bounded number of
+    iterations.
+
+    Bodies on the floor, and bodies resting on those, are
+    "supported": they can't be pushed down, so piles stack
+    on them instead of sinking, and a body that comes to
+    rest on a supported one is grounded just like on the
+    floor
+    """
+    def __init__(self, iterations=4, max_stack=64):
+        """
+        Constructs an ImpulseSolver that spends at most the
+        given number of iterations on each solver pass, and
+        that supports piles up to max_stack bodies high
+        """
+        self.iterations = iterations
+        self.max_stack = max_stack
+
+    def contacts(self, first, second, x, y, w, h):
+        """
+        Returns the penetration depth, the axis (True for
+        x), the sign of the contact normal (pointing from
+        first to second) and whether the boxes touch at all
+        for every pair, taking the axis of least penetration
+        """
+        overlap_x, overlap_y = overlaps(first, second, x, y, w, h)
+        along_x = overlap_x < overlap_y
+        contact = (overlap_x >= 0) & (overlap_y >= 0) & ((overlap_x > 0) | (overlap_y > 0))
+        depth = np.where(contact, np.where(along_x, overlap_x, overlap_y), 0)
+
+        # Compare centers along the contact axis (doubled to
+        #   stay in whole numbers)
+        center_x = (2 * x[second] + w[second]) - (2 * x[first] + w[first])
+        center_y = (2 * y[second] + h[second]) - (2 * y[first] + h[first])
+        normal = np.where(np.where(along_x, center_x, center_y) < 0, -1.0, 1.0)
+        return depth, along_x, normal, contact
+
+    def supported(self, first, second, along_x, normal, touching, y, h, floor, grounded=None):
+        """
+        Returns a mask of supported bodies: those on the
+        floor (or marked in grounded, say those resting on
+        solid tiles), plus (up to max_stack levels high)
+        those resting on top of a supported body
+        """
+        supported = y + h >= floor
+        if grounded is not None:
+            supported |= grounded
+        vertical = touching & ~along_x
+        for level in range(self.max_stack):
+            first_on_top = vertical & (normal > 0) & supported[second] & ~supported[first]
+            second_on_top = vertical & (normal < 0) & supported[first] & ~supported[second]
+            if not (first_on_top.any() or second_on_top.any()):
+                break
+            supported[first[first_on_top]] = True
+            supported[second[second_on_top]] = True
+        return supported
+
+    def shares(self, first, second, along_x, normal, supported):
+        """
+        Returns the fraction of each contact's response taken
+        by the first and second body. Bodies are equally
+        heavy, except that a supported body takes none of a
+        vertical push pointing down into it
+        """
+        pinned_a = ~along_x & supported[first] & (normal < 0)
+        pinned_b = ~along_x & supported[second] & (normal > 0)
+        share_a = np.where(pinned_a, 0.0, np.where(pinned_b, 1.0, 0.5))
+        share_b = np.where(pinned_b, 0.0, np.where(pinned_a, 1.0, 0.5))
+        both = pinned_a & pinned_b
+        share_a[both] = 0
+        share_b[both] = 0
+        return share_a, share_b
+
+    def solve(self, first, second, x, y, w, h, dx, dy, proration, can_bounce, bounds,
+              impact=None, level=None):
+        """
+        Resolves every (first[k], second[k]) contact between
+        the given bodies in place. Bounds are the stage's
+        (left, top, right, bottom). Impact optionally holds
+        (toi, along_x, normal) arrays from sweep() for pairs
+        predicted to collide during this update; those
+        bodies are first advanced to where they meet.
+        Bodies resting on the solid tiles of level (a
+        level.TileMap), if given, are supported, and no
+        body is moved into a solid tile.
+        Returns the x & y shift applied to each body (so
+        drawing rects can follow) and the supported mask
+        """
+        start_x = x.copy()
+        start_y = y.copy()
+        if impact is not None:
+            self.advance(first, second, x, y, dx, dy, impact[0])
+        depth, along_x, normal, touching = self.contacts(first, second, x, y, w, h)
+
+        # Predicted pairs meet along the axis & normal found by
+        #   the sweep, even if rounding kept them a pixel apart
+        if impact is not None:
+            predicted = impact[0] > 0
+            along_x[predicted] = impact[1][predicted]
+            normal[predicted] = impact[2][predicted]
+            touching |= predicted
+        grounded = level.resting(x, y, w, h) if level is not None else None
+        supported = self.supported(first, second, along_x, normal, touching, y, h, bounds[3],
+                                   grounded)
+        share_a, share_b = self.shares(first, second, along_x, normal, supported)
+        self.apply_impulses(first, second, along_x, normal, touching, share_a, share_b,
+                            dx, dy, proration)
+
+        # Bodies knocked up or down have to be able to bounce
+        #   again to settle back onto the floor...
+        vertical = touching & ~along_x
+        can_bounce[first[vertical & (share_a > 0)]] = True
+        can_bounce[second[vertical & (share_b > 0)]] = True
+
+        # ...while those brought to a stop on top of a
+        #   supported body are grounded there
+        resting = supported & (y + h < bounds[3]) & (np.abs(dy) < 1e-9)
+        dy[resting] = 0
+        can_bounce[resting] = False
+
+        self.separate(first, second, x, y, w, h, supported, bounds)
+        if level is not None:
+            self.keep_out(level, start_x, start_y, x, y, w, h)
+        return x - start_x, y - start_y, supported
+
+    def advance(self, first, second, x, y, dx, dy, toi):
+        """
+        Moves each body with a predicted impact forward to
+        the earliest time of impact among its pairs
+        (rounded toward its starting point)
+        """
+        earliest = np.full(len(x), np.inf)
+        predicted = (toi > 0) & np.isfinite(toi)
+        np.minimum.at(earliest, first[predicted], toi[predicted])
+        np.minimum.at(earliest, second[predicted], toi[predicted])
+        moving = np.isfinite(earliest)
+        x[moving] += np.trunc(earliest[moving] * dx[moving])
+        y[moving] += np.trunc(earliest[moving] * dy[moving])
+
+    def apply_impulses(self, first, second, along_x, normal, touching, share_a, share_b,
+                       dx, dy, proration):
+        """
+        Changes the deltas of approaching bodies so they
+        part along the contact normal, losing the average
+        of their prorations in relative speed. Bodies too
+        slow to part simply stop approaching
+        """
+        decay = (proration[first] + proration[second]) / 2.0
+        n = len(dx)
+
+        # Contacts are solved simultaneously, so each body's
+        #   change is averaged over its active contacts along
+        #   that axis, and the pass is repeated to let piles
+        #   converge
+        for iteration in range(self.iterations):
+            velocity_a = np.where(along_x, dx[first], dy[first])
+            velocity_b = np.where(along_x, dx[second], dy[second])
+            approach = (velocity_b - velocity_a) * normal
+            active = touching & (approach < 0) & ((share_a > 0) | (share_b > 0))
+            if not active.any():
+                break
+
+            # Change in relative normal speed along the normal
+            change = np.maximum(-approach - decay, 0) - approach
+            impulse = np.where(active, change * normal, 0)
+            for axis, mask in ((dx, active & along_x), (dy, active & ~along_x)):
+                moves_a = mask & (share_a > 0)
+                moves_b = mask & (share_b > 0)
+                count = np.bincount(first, moves_a, n) + np.bincount(second, moves_b, n)
+                count[count == 0] = 1
+                np.add.at(axis, first[moves_a], -(impulse * share_a)[moves_a] / count[first[moves_a]])
+                np.add.at(axis, second[moves_b], (impulse * share_b)[moves_b] / count[second[moves_b]])
+
+            # Only the first pass is a bounce; later passes
+            #   just stop what is still approaching
+            decay = np.inf
+
+    def separate(self, first, second, x, y, w, h, supported, bounds):
+        """
+        Pushes penetrating pushboxes apart in whole pixels,
+        averaging each body's corrections across its contacts
+        and keeping it inside bounds
+        """
+        left, top, right, bottom = bounds
+        n = len(x)
+        for iteration in range(self.iterations):
+            depth, along_x, normal, touching = self.contacts(first, second, x, y, w, h)
+            if not depth.any():
+                break
+            share_a, share_b = self.shares(first, second, along_x, normal, supported)
+
+            # Split the depth by share, giving the odd pixel
+            #   to the second body
+            part_a = np.floor(depth * share_a)
+            push_a = -part_a * normal
+            push_b = np.where(share_b > 0, depth - part_a, 0) * normal
+            count = np.bincount(first, depth > 0, n) + np.bincount(second, depth > 0, n)
+            count[count == 0] = 1
+            shift_x = (np.bincount(first, np.where(along_x, push_a, 0), n) +
+                       np.bincount(second, np.where(along_x, push_b, 0), n)) / count
+            shift_y = (np.bincount(first, np.where(along_x, 0, push_a), n) +
+                       np.bincount(second, np.where(along_x, 0, push_b), n)) / count
+
+            # Round away from zero so every correction moves
+            #   at least a pixel
+            x += np.sign(shift_x) * np.ceil(np.abs(shift_x))
+            y += np.sign(shift_y) * np.ceil(np.abs(shift_y))
+            np.clip(x, left, right - w, out=x)
+            np.clip(y, top, bottom - h, out=y)
+
+    def keep_out(self, level, start_x, start_y, x, y, w, h):
+        """
+        Stops bodies moved from (start_x, start_y) at the
+        first solid tile of level along the way (along x,
+        then y), the way stepping a body does
+        """
+        edge = level.sweep_x(start_x, x, start_y, w, h)
+        hit = ~np.isnan(edge)
+        x[hit] = np.where(x > start_x, edge - w, edge)[hit]
+        edge = level.sweep_y(start_y, y, x, w, h)
+        hit = ~np.isnan(edge)
+        y[hit] = np.where(y > start_y, edge - h, edge)[hit]
+
+# Record of one pair of overlapping hitboxes owned by
+#   different objects: owner indices (attacker first for
+#   hits) and the indices of the two boxes themselves
+HIT_DTYPE = np.dtype([("first", np.int32), ("second", np.int32),
+                      ("first_box", np.int32), ("second_box", np.int32)])
+
+class HitboxQuery(object):
+    """
+    Batched overlap queries over the typed hitboxes (see
+    objects.TypedRect and con.BOX_TYPES) of every active
+    object. Boxes are gathered into flat arrays each frame
+    and every Atk-vs-Vuln & Sprite-vs-Sprite overlap is
+    found in one broad phase pass
+    """
+    def __init__(self, cell_size=64):
+        """
+        Creates an empty query over a grid of the given
+        cell size
+        """
+        self.grid = SpatialHash(cell_size)
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets every gathered box (call once per frame
+        before gathering)
+        """
+        # Owners in gathering order, and per-chunk arrays of
+        #   box owner indices, type codes & rects
+        self.owners = []
+        self.owner_chunks = []
+        self.type_chunks = []
+        self.rect_chunks = []
+
+    def add(self, owner, rects):
+        """
+        Gathers an owner's TypedRects
+        """
+        rects = list(rects)
+        self.add_boxes(owner, [con.BOX_TYPES.index(rect.type) for rect in rects],
+                       [tuple(rect) for rect in rects])
+
+    def add_frame(self, owner, atlas, frame, x, y, facing_left=False):
+        """
+        Gathers the hitboxes of an animation frame (see
+        spritesheet.FrameAtlas) drawn with its top left at
+        (x, y)
+        """
+        start = atlas.box_start[frame]
+        end = atlas.box_start[frame + 1]
+        rects = atlas.boxes(frame, facing_left) + [x, y, 0, 0]
+        self.add_boxes(owner, atlas.box_types[start:end], rects)
+
+    def add_boxes(self, owner, types, rects):
+        """
+        Gathers an owner's boxes, given as type codes and
+        (x, y, width, height) rects
+        """
+        types = np.asarray(types, dtype=np.int8)
+        self.owner_chunks.append(np.full(len(types), len(self.owners), dtype=np.int32))
+        self.owners.append(owner)
+        self.type_chunks.append(types)
+        self.rect_chunks.append(np.asarray(rects, dtype=np.float64).reshape(-1, 4))
+
+    def boxes(self):
+        """
+        Returns the gathered box owner indices, type codes
+        and (n, 4) rects
+        """
+        if not self.owner_chunks:
+            return (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int8),
+                    np.zeros((0, 4)))
+        return (np.concatenate(self.owner_chunks), np.concatenate(self.type_chunks),
+                np.concatenate(self.rect_chunks))
+
+    def query(self):
+        """
+        Returns two HIT_DTYPE record arrays: Atk boxes
+        overlapping Vuln boxes (attacker first), and
+        Sprite boxes overlapping each other. Boxes of the
+        same owner never hit each other
+        """
+        owner, types, rects = self.boxes()
+        x, y, w, h = rects.T
+        first, second = self.grid.overlapping_pairs(x, y, w, h)
+        keep = owner[first] != owner[second]
+        first, second = first[keep], second[keep]
+        first_type = types[first]
+        second_type = types[second]
+
+        # Atk vs Vuln, turned around where the Vuln box
+        #   came first
+        sprite, vuln, atk = [con.BOX_TYPES.index(name) for name in ("Sprite", "Vuln", "Atk")]
+        forward = (first_type == atk) & (second_type == vuln)
+        backward = (first_type == vuln) & (second_type == atk)
+        hits = _records(owner, np.concatenate((first[forward], second[backward])),
+                        np.concatenate((second[forward], first[backward])))
+
+        # Sprite vs Sprite
+        pushing = (first_type == sprite) & (second_type == sprite)
+        pushes = _records(owner, first[pushing], second[pushing])
+        return hits, pushes
+
+def _records(owner, first, second):
+    """
+    Packs pairs of box indices into HIT_DTYPE records
+    """
+    records = np.empty(len(first), dtype=HIT_DTYPE)
+    records["first"] = owner[first]
+    records["second"] = owner[second]
+    records["first_box"] = first
+    records["second_box"] = second
+    return records
@@ -0,0 +1,50 @@
+"""
+Module for the entity-component layer of stages. Object
+classes declare the components they have (gravity,
+friction, bounce, input) in their components member, and
+a ComponentIndex sorts a stage's objects by component
+once per layout. Gravity and friction are applied as
+systems (PlayStage.apply_gravity() & apply_friction() loop
+over only the objects with that component rather than
+type-checking every object every update); bounce stays
+part of the collision response in each object's own
+update(), as it happens at the boundary or tile hit
+partway through the move
+"""
+import numpy as np
+
+# Components an object class can declare: subject to stage
+#   gravity (is_gravity & grav_modifier), decays deltaX by
+#   friction, bounces off boundaries & other objects
+#   (proration & can_bounce), and handles input (gets the
+#   KEYDOWN events of its input_keys)
+GRAVITY = "gravity"
+FRICTION = "friction"
+BOUNCE = "bounce"
+INPUT = "input"
+COMPONENTS = (GRAVITY, FRICTION, BOUNCE, INPUT)
+
+class ComponentIndex(object):
+    """
+    Which of a stage's objects have each component, for
+    one stage layout (see PlayStage.components())
+    """
+    def __init__(self, objects, key):
+        """
+        Builds a membership mask per component
+        """
+        self.key = key
+
+        # Objects of one class share their components, so
+        #   each class is looked up once
+        rows = {}
+        table = np.zeros((len(objects), len(COMPONENTS)), dtype=np.bool_)
+        for i, object in enumerate(objects):
+            kind = type(object)
+            row = rows.get(kind)
+            if row is None:
+                row = rows[kind] = [name in kind.components for name in COMPONENTS]
+            table[i] = row
+
+        # Per component, whether each object has it
+        self.masks = dict((name, table[:, k]) for k, name in enumerate(COMPONENTS))
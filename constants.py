@@ -15,9 +15,24 @@ DEBUG = True
 # Game version
 GAME_VERSION = "0.0.1-alpha"
 
-# Target frame rate
+# Target frame rate (caps rendering only)
 TARGET_FPS = 60
 
+# Fixed simulation rate: stages update exactly this many
+#   times per second of game time, however fast frames are
+#   rendered (stage gravity, ball friction, etc are all
+#   expressed per update at this rate)
+SIM_RATE = 60
+
+# Max updates run per rendered frame while catching up;
+#   past this the backlog is dropped and the game slows
+#   down rather than spiralling
+MAX_UPDATES_PER_FRAME = 5
+
+# Pixel data (in bytes) the shared image cache may hold
+#   in images no object is using before evicting them
+ASSET_CACHE_BYTES = 16 * 1024 * 1024
+
 # Primitive colors
 BLACK    =    (   0,   0,   0)
 BLUE     =    (   0,   0, 255)
@@ -61,6 +76,10 @@ Tuple member legend:
 			 but only specific frames will have 1 or more "Atk" rects.
 """
 
+# Hitbox type names, by the integer code batched hitbox
+#   queries & frame atlases store in place of the name
+BOX_TYPES = ("Sprite", "Vuln", "Atk")
+
 PHO_ANIM = (
 	( "IDLE_1",   40, ("Sprite", 30, 46, 25, 68), ("Vuln", 32, 50, 22, 64), ("Vuln", 34, 30, 16, 20) ),
 	( "CROUCH_1", 40, ("Sprite", 39, 66, 20, 48), ("Vuln", 40, 68, 20, 20), ("Vuln", 32, 88, 28, 26), ("Vuln", 44, 52, 13, 16) ),
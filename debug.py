@@ -2,6 +2,101 @@
 Module for debugging-specific methods and objects
 Written Feb 1, 2016 by Benjamin Reed
 """
+from timeit import default_timer
+import numpy as np
+import pygame as pyg
+import constants as con
+
+# Phases of a frame timed by FrameProfiler, in the order
+#   they run (stage update steps run once per update, and
+#   are summed over every update in a frame)
+PHASES = ("event_loop", "save_positions", "resolve_collisions", "apply_gravity",
+          "input", "update_objects", "detect_collisions", "settle", "metrics", "draw", "flip")
+PHASE_INDEX = dict((phase, i) for i, phase in enumerate(PHASES))
+
+# Frames kept by the profiler's ring buffer
+PROFILE_FRAMES = 120
+
+# Frames between refreshes of the DebugConsole overlay
+#   (its text & sparkline are cached in between)
+CONSOLE_REFRESH = 15
+
+class FrameProfiler(object):
+    """
+    Times every PHASES phase of each frame into a fixed
+    size ring buffer. Phases are timed as laps: lap(phase)
+    charges phase with the time since the previous lap (or
+    since the frame began). Does nothing while disabled
+    """
+    def __init__(self, capacity=PROFILE_FRAMES, enabled=True):
+        """
+        Allocates a ring buffer holding capacity frames
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+
+        # Per-phase seconds & total frame seconds of the
+        #   last capacity frames; index is the slot the
+        #   next finished frame goes to, count the number
+        #   of slots filled
+        self.times = np.zeros((capacity, len(PHASES)))
+        self.frame_times = np.zeros(capacity)
+        self.index = 0
+        self.count = 0
+
+        # Timings of the frame in progress
+        self.current = [0.0] * len(PHASES)
+        self.frame_start = None
+        self.last = None
+
+    def begin_frame(self):
+        """
+        Finishes the frame in progress (if any), storing
+        its timings, and starts timing a new one
+        """
+        if not self.enabled:
+            return
+        now = default_timer()
+        if self.frame_start is not None:
+            self.times[self.index] = self.current
+            self.frame_times[self.index] = now - self.frame_start
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.current = [0.0] * len(PHASES)
+        self.frame_start = now
+        self.last = now
+
+    def lap(self, phase):
+        """
+        Charges phase with the time since the last lap
+        """
+        if not self.enabled:
+            return
+        now = default_timer()
+        if self.last is not None:
+            self.current[PHASE_INDEX[phase]] += now - self.last
+        self.last = now
+
+    def recent(self, frames=None):
+        """
+        Returns the per-phase & frame times (seconds) of the
+        last frames finished frames (all kept if None),
+        oldest first
+        """
+        frames = self.count if frames is None else min(frames, self.count)
+        order = np.arange(self.index - frames, self.index) % self.capacity
+        return self.times[order], self.frame_times[order]
+
+    def averages(self, frames=None):
+        """
+        Returns the mean milliseconds of every phase over
+        the last frames frames, and the frame rate
+        """
+        times, frame_times = self.recent(frames)
+        if not len(frame_times):
+            return np.zeros(len(PHASES)), 0.0
+        mean = frame_times.mean()
+        return times.mean(axis=0) * 1000.0, 1.0 / mean if mean > 0 else 0.0
 
 class DebugConsole:
     """
@@ -9,3 +104,79 @@ class DebugConsole:
     text information useful for debugging to the
     screen
     """
+    def __init__(self, profiler, position=(20, 20), refresh=CONSOLE_REFRESH):
+        """
+        Constructs a DebugConsole showing profiler's data,
+        drawn with its top left at position and re-rendered
+        every refresh frames
+        """
+        self.profiler = profiler
+        self.position = position
+        self.refresh = refresh
+        self.font = pyg.font.Font(None, 16)
+        self.line_height = self.font.get_linesize()
+
+        # Rendered text lines, by text (lines mostly repeat
+        #   from refresh to refresh)
+        self.text_cache = {}
+
+        # Overlay as last rendered, and frames until the
+        #   next refresh
+        self.surface = None
+        self.countdown = 0
+
+    def text(self, line):
+        """
+        Returns a (cached) rendered line of text
+        """
+        surface = self.text_cache.get(line)
+        if surface is None:
+            if len(self.text_cache) > 4 * (len(PHASES) + 2):
+                self.text_cache.clear()
+            surface = self.font.render(line, True, con.WHITE)
+            self.text_cache[line] = surface
+        return surface
+
+    def render(self, object_count):
+        """
+        Re-renders the overlay: FPS & object count, average
+        milliseconds of every phase, and a sparkline of
+        frame times (the 60 FPS budget marked in red)
+        """
+        phase_ms, fps = self.profiler.averages(self.refresh)
+        lines = ["FPS %5.1f  objects %d" % (fps, object_count)]
+        lines += ["%-18s %6.2f ms" % (phase, ms) for phase, ms in zip(PHASES, phase_ms)]
+        texts = [self.text(line) for line in lines]
+
+        # Panel: text lines, then the sparkline
+        spark_height = 30
+        width = max(max(text.get_width() for text in texts), self.profiler.capacity) + 8
+        height = len(texts) * self.line_height + spark_height + 12
+        surface = pyg.Surface((width, height))
+        surface.fill(con.BLACK)
+        for i, text in enumerate(texts):
+            surface.blit(text, (4, 4 + i * self.line_height))
+
+        # Sparkline of frame times, scaled so twice the
+        #   frame budget fills its height
+        top = 8 + len(texts) * self.line_height
+        budget = 1.0 / con.TARGET_FPS
+        frame_times = self.profiler.recent()[1]
+        heights = np.minimum(frame_times / (2 * budget), 1.0) * spark_height
+        bottom = top + spark_height
+        for x, h in enumerate(heights.tolist()):
+            pyg.draw.line(surface, con.GREEN, (4 + x, bottom), (4 + x, bottom - int(h)))
+        pyg.draw.line(surface, con.RED, (4, bottom - spark_height // 2),
+                      (4 + self.profiler.capacity, bottom - spark_height // 2))
+        self.surface = surface
+
+    def draw(self, screen, object_count):
+        """
+        Draws the overlay (re-rendering it if due) and
+        returns the rect it covers
+        """
+        if self.surface is None or self.countdown <= 0:
+            self.render(object_count)
+            self.countdown = self.refresh
+        self.countdown -= 1
+        return screen.blit(self.surface, self.position)
@@ -4,12 +4,15 @@ controllable characters
 Written Dec 25, 2015 by Benjamin Reed
 Version 0.0.1-alpha
 """
+import struct
+import numpy as np
+
 class InputEvent:
     """
     Class to encompass a Pygame input event
     (so as to retain type and key members)
-    with a timestamp in frames since last input
-    event recorded.
+    with a timestamp: the stage update (frame)
+    the event was delivered in, once known.
 	
     (The intention is not just to timestamp,
     but also remember event type and event 
@@ -19,13 +22,172 @@ class InputEvent:
     separated in time by events for different
     keys.)
     """
-    def __init__(self, type, key):
-    #def __init__(self, type, key, timestamp):
+    def __init__(self, type, key, timestamp=None):
         """
         Constructs an InputEvent with a Pygame
-        event and a timestamp since previous
-        event as members
+        event type & key and a frame timestamp
+        as members
         """
         self.type = type
         self.key = key
-        #self.timestamp = timestamp
+        self.timestamp = timestamp
+
+class InputBus(object):
+    """
+    Single-threaded, per-frame input dispatcher. Events
+    posted during a frame are batched and delivered in one
+    pass to every handler subscribed to their type and key,
+    without locking or copying the events
+    """
+    def __init__(self):
+        """
+        Constructs an InputBus with no pending events or
+        subscribers
+        """
+        # Events posted since the last dispatch()
+        self.events = []
+
+        # Handlers by (event type, key); a key of None
+        #   matches every key of that type
+        self.handlers = {}
+
+        # Optional InputRecorder logging every delivered
+        #   event, and InputReplayer whose logged events
+        #   replace live ones
+        self.recorder = None
+        self.replayer = None
+
+    def post(self, event):
+        """
+        Queues an InputEvent for the next dispatch()
+        """
+        self.events.append(event)
+
+    def subscribe(self, handler, type, keys=None):
+        """
+        Has handler called with every event of the given
+        type and one of the given keys (any key if None)
+        """
+        for key in (keys if keys is not None else (None,)):
+            self.handlers.setdefault((type, key), []).append(handler)
+
+    def unsubscribe(self, handler):
+        """
+        Stops delivering events to handler
+        """
+        for handlers in self.handlers.values():
+            while handler in handlers:
+                handlers.remove(handler)
+
+    def dispatch(self, frame=0):
+        """
+        Delivers every pending event, in posting order, to
+        its subscribers (in subscription order), stamping it
+        with frame, then clears the batch
+        """
+        if self.replayer is not None:
+            del self.events[:]
+            self.replayer.feed(self, frame)
+        if not self.events:
+            return
+        for event in self.events:
+            event.timestamp = frame
+        if self.recorder is not None:
+            self.recorder.record(self.events)
+        handlers = self.handlers
+        for event in self.events:
+            for handler in handlers.get((event.type, event.key), ()):
+                handler(event)
+            for handler in handlers.get((event.type, None), ()):
+                handler(event)
+        del self.events[:]
+
+# Input log layout: a header (magic & format version),
+#   then one little-endian record per event: frame
+#   timestamp, event type & key (32 bits, as Pygame 2 key
+#   codes such as K_UP don't fit in 16; version 1 logs
+#   stored 16-bit keys and are rejected)
+LOG_MAGIC = "INPL"
+LOG_VERSION = 2
+LOG_HEADER = struct.Struct("<4sH")
+LOG_RECORD = struct.Struct("<IHI")
+LOG_DTYPE = np.dtype([("frame", "<u4"), ("type", "<u2"), ("key", "<u4")])
+
+class InputRecorder(object):
+    """
+    Writes frame-stamped InputEvents to a compact binary
+    log (see LOG_RECORD), for InputReplayer to feed back
+    """
+    def __init__(self, path):
+        """
+        Opens (truncating) the log at path and writes its
+        header
+        """
+        self.file = open(path, "wb")
+        self.file.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION))
+        self.count = 0
+
+    def record(self, events):
+        """
+        Appends a batch of timestamped events
+        """
+        pack = LOG_RECORD.pack
+        self.file.write("".join(pack(event.timestamp, event.type, event.key)
+                                for event in events))
+        self.count += len(events)
+
+    def close(self):
+        """
+        Flushes & closes the log
+        """
+        self.file.close()
+
+class InputReplayer(object):
+    """
+    Reads an input log and posts its events back to an
+    InputBus in the same frames they were recorded in, so
+    a run with the same stage setup reproduces the
+    recorded one exactly
+    """
+    def __init__(self, path):
+        """
+        Loads every record of the log at path
+        """
+        with open(path, "rb") as log:
+            data = log.read()
+        magic, version = LOG_HEADER.unpack_from(data)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise ValueError("%s is not a version %d input log" % (path, LOG_VERSION))
+        self.records = np.frombuffer(data, LOG_DTYPE, offset=LOG_HEADER.size)
+        self.frames = self.records["frame"]
+
+        # Index of the next record to replay
+        self.position = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def last_frame(self):
+        """
+        Returns the frame of the last logged event (-1 if
+        the log is empty)
+        """
+        return int(self.frames[-1]) if len(self.records) else -1
+
+    def seek(self, frame):
+        """
+        Moves playback back (or ahead) to the start of
+        frame, e.g. after a stage rollback
+        """
+        self.position = int(np.searchsorted(self.frames, frame))
+
+    def feed(self, bus, frame):
+        """
+        Posts the events logged for frame to bus
+        """
+        start = self.position + np.searchsorted(self.frames[self.position:], frame)
+        end = self.position + np.searchsorted(self.frames[self.position:], frame, "right")
+        records = self.records[start:end]
+        for event_type, key in zip(records["type"].tolist(), records["key"].tolist()):
+            bus.post(InputEvent(event_type, key))
+        self.position = end
@@ -0,0 +1,228 @@
+"""
+Module for tile-map level geometry: static solid tiles on
+a square grid that objects collide with on top of the
+stage boundaries. A level is stored as a compact binary
+file holding a header, one byte per tile and a summed-area
+table of the solid tiles (the collision index, built once
+when the level is saved), and is memory-mapped on load, so
+big levels cost nothing until the areas objects move
+through are touched
+
+Run python level.py --help to build a level from a text
+file
+"""
+import struct
+import argparse
+import numpy as np
+
+LEVEL_MAGIC = "TMAP"
+LEVEL_VERSION = 1
+
+# Header: magic & version, tile size (in pixels), then the
+#   number of columns & rows of tiles
+LEVEL_HEADER = struct.Struct("<4sHHII")
+
+# Characters of a solid tile in text levels (see
+#   from_text()); any other character is empty
+SOLID_CHARS = "#X"
+
+class TileMap(object):
+    """
+    Grid of tiles (0 for empty, anything else solid) and
+    its summed-area table: sums[r, c] counts the solid tiles
+    above row r and left of column c, so the solid tiles in
+    any block of rows & columns are counted in four lookups
+    whatever its size
+    """
+    def __init__(self, tiles, tile_size, sums=None):
+        """
+        Wraps a 2D array of tiles (rows of columns), building
+        the summed-area table unless given
+        """
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.rows, self.cols = tiles.shape
+        if sums is None:
+            sums = np.zeros((self.rows + 1, self.cols + 1), dtype=np.uint32)
+            sums[1:, 1:] = (tiles != 0).cumsum(axis=0).cumsum(axis=1)
+        self.sums = sums
+
+    @property
+    def width(self):
+        return self.cols * self.tile_size
+
+    @property
+    def height(self):
+        return self.rows * self.tile_size
+
+    def save(self, path):
+        """
+        Writes the level and its collision index to a
+        binary level file
+        """
+        with open(path, "wb") as output:
+            output.write(LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, self.tile_size,
+                                           self.cols, self.rows))
+            output.write(np.ascontiguousarray(self.tiles, dtype=np.uint8).tobytes())
+            output.write(np.ascontiguousarray(self.sums, dtype="<u4").tobytes())
+
+    def count(self, top, left, bottom, right):
+        """
+        Returns the number of solid tiles in rows top up to
+        (not including) bottom and columns left up to right,
+        for arrays of blocks (parts off the map are empty)
+        """
+        top = np.clip(top, 0, self.rows)
+        bottom = np.clip(bottom, 0, self.rows)
+        left = np.clip(left, 0, self.cols)
+        right = np.clip(right, 0, self.cols)
+        sums = self.sums
+        return (sums[bottom, right].astype(np.int64) - sums[top, right]
+                - sums[bottom, left] + sums[top, left])
+
+    def first_line(self, near, far, step, start, end, rows):
+        """
+        Returns, per box, the first line of tiles (rows if
+        rows is set, else columns) from near to far (both
+        inclusive) in steps of step (1 or -1, no lines if
+        far lies behind near) holding a solid tile between
+        start & end (inclusive) along the other axis, or -1
+        where none does. Each box costs a binary search over
+        the summed-area table, however far it reaches
+        """
+        lines = np.maximum((far - near) * step + 1, 0)
+
+        # Smallest number of lines from near that hold a
+        #   solid tile (lines + 1 if none do)
+        lo = np.ones_like(lines)
+        hi = lines + 1
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            last = near + step * (mid - 1)
+            low = np.minimum(near, last)
+            high = np.maximum(near, last) + 1
+            if rows:
+                solid = self.count(low, start, high, end + 1) > 0
+            else:
+                solid = self.count(start, low, end + 1, high) > 0
+            hi = np.where(active & solid, mid, hi)
+            lo = np.where(active & ~solid, mid + 1, lo)
+            active = lo < hi
+        return np.where(lo <= lines, near + step * (lo - 1), -1)
+
+    def sweep_x(self, old_x, x, y, w, h):
+        """
+        Returns where boxes moved along x from old_x to x
+        first run into a solid tile: the x of the left edge
+        of the tile hit moving right and of the right edge
+        of the tile hit moving left (NaN where none is hit)
+        """
+        size = self.tile_size
+        top = np.floor_divide(y, size).astype(np.int64)
+        bottom = np.floor_divide(y + h - 1, size).astype(np.int64)
+        old_right = np.floor_divide(old_x + w - 1, size).astype(np.int64)
+        old_left = np.floor_divide(old_x, size).astype(np.int64)
+        right = x > old_x
+        near = np.where(right, old_right + 1, old_left - 1)
+        far = np.where(right, np.floor_divide(x + w - 1, size),
+                       np.floor_divide(x, size)).astype(np.int64)
+        col = self.first_line(near, far, np.where(right, 1, -1), top, bottom, False)
+        edge = np.where(right, col * size, (col + 1) * size).astype(np.float64)
+        edge[col < 0] = np.nan
+        return edge
+
+    def sweep_y(self, old_y, y, x, w, h):
+        """
+        Returns where boxes moved along y from old_y to y
+        first run into a solid tile: the y of the top edge
+        of the tile hit moving down and of the bottom edge
+        of the tile hit moving up (NaN where none is hit)
+        """
+        size = self.tile_size
+        left = np.floor_divide(x, size).astype(np.int64)
+        right = np.floor_divide(x + w - 1, size).astype(np.int64)
+        old_bottom = np.floor_divide(old_y + h - 1, size).astype(np.int64)
+        old_top = np.floor_divide(old_y, size).astype(np.int64)
+        down = y > old_y
+        near = np.where(down, old_bottom + 1, old_top - 1)
+        far = np.where(down, np.floor_divide(y + h - 1, size),
+                       np.floor_divide(y, size)).astype(np.int64)
+        row = self.first_line(near, far, np.where(down, 1, -1), left, right, True)
+        edge = np.where(down, row * size, (row + 1) * size).astype(np.float64)
+        edge[row < 0] = np.nan
+        return edge
+
+    def resting(self, x, y, w, h):
+        """
+        Returns a mask of the boxes whose bottom edge sits
+        right on top of a solid tile
+        """
+        size = self.tile_size
+        bottom = y + h
+        row = np.floor_divide(bottom, size).astype(np.int64)
+        left = np.floor_divide(x, size).astype(np.int64)
+        right = np.floor_divide(x + w - 1, size).astype(np.int64)
+        return (np.mod(bottom, size) == 0) & (self.count(row, left, row + 1, right + 1) > 0)
+
+    def solid_tiles(self, left, top, right, bottom):
+        """
+        Returns the rows & columns of the solid tiles
+        overlapping the given pixel area
+        """
+        size = self.tile_size
+        row0, col0 = max(top // size, 0), max(left // size, 0)
+        row1 = min(-(-bottom // size), self.rows)
+        col1 = min(-(-right // size), self.cols)
+        if row0 >= row1 or col0 >= col1:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows, cols = np.nonzero(self.tiles[row0:row1, col0:col1])
+        return rows + row0, cols + col0
+
+def load(path):
+    """
+    Returns the TileMap of a binary level file, with its
+    tiles & collision index memory-mapped (read-only)
+    """
+    with open(path, "rb") as input:
+        header = input.read(LEVEL_HEADER.size)
+    magic, version, tile_size, cols, rows = LEVEL_HEADER.unpack(header)
+    if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+        raise ValueError("%s is not a version %d level file" % (path, LEVEL_VERSION))
+    offset = LEVEL_HEADER.size
+    tiles = np.memmap(path, np.uint8, "r", offset, (rows, cols))
+    offset += rows * cols
+    sums = np.memmap(path, np.dtype("<u4"), "r", offset, (rows + 1, cols + 1))
+    return TileMap(tiles, tile_size, sums)
+
+def from_text(lines, tile_size):
+    """
+    Returns a TileMap of text rows, one character per tile
+    (SOLID_CHARS are solid); short rows are padded with
+    empty tiles
+    """
+    lines = [line.rstrip("\r\n") for line in lines]
+    cols = max(len(line) for line in lines) if lines else 0
+    tiles = np.zeros((len(lines), cols), dtype=np.uint8)
+    for row, line in enumerate(lines):
+        for col, char in enumerate(line):
+            if char in SOLID_CHARS:
+                tiles[row, col] = 1
+    return TileMap(tiles, tile_size)
+
+def main():
+    """
+    Builds a binary level file from a text level
+    """
+    parser = argparse.ArgumentParser(description="Build a binary level from a text level")
+    parser.add_argument("text", help="text level, one character per tile ('#' or 'X' solid)")
+    parser.add_argument("output", help="binary level file to write")
+    parser.add_argument("--tile-size", type=int, default=32, help="tile size in pixels")
+    args = parser.parse_args()
+    with open(args.text) as text:
+        level = from_text(text.readlines(), args.tile_size)
+    level.save(args.output)
+    print "%s: %dx%d tiles of %d pixels" % (args.output, level.cols, level.rows, level.tile_size)
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,24 @@ Credit for this implementation goes to Sean J. McKiernan
 (Mekire) at /r/pygame
 https://github.com/Mekire
 """
+import os
 import sys
+import time
 import Queue
+import argparse
+import multiprocessing
+from timeit import default_timer
 
 import pygame as pyg
 import constants as con
+import assets
 from input import *
 from objects import *
 from stage import *
+from debug import FrameProfiler, DebugConsole
+from metrics import MetricsAggregator
+from shared import SharedFrames
+import level as levels
 
 class App:
     """
@@ -22,10 +32,15 @@ class App:
     including initialization, event handling, and state 
     updates
     """
-    def __init__(self):
+    def __init__(self, vectorized=False, record=None, replay=None, metrics=None, level=None):
         """
         Get a reference to the display surface; set up required attributes;
         and instantiate player and stage objects
+        (vectorized selects the batched physics engine for the stage;
+        record & replay are paths of input logs to write input to, or
+        to play input back from in place of live input; metrics is the
+        path of a log to write per-frame stage metrics to; level is the
+        path of a binary level file to load into the stage)
         """
         self.screen = pyg.display.get_surface()
         self.screen_rect = self.screen.get_rect()
@@ -42,7 +57,9 @@ class App:
         self.stage_list = []
         self.stage_index = 0
         #self.test_stage = PlayStage(TESTSTAGE, self.player)
-        self.test_stage = PlayStage(TESTSTAGE)
+        self.test_stage = PlayStage(TESTSTAGE, vectorized)
+        if level is not None:
+            self.test_stage.set_level(levels.load(level))
         self.stage_list.append(self.test_stage)
         self.current_stage = self.stage_list[self.stage_index]
 
@@ -50,8 +67,30 @@ class App:
         #   stage needs to be "on point"
         self.ball = Ball(self.current_stage)
         self.ball2 = Ball(self.current_stage, 300, 70)
-        self.current_stage.objects.append(self.ball)
-        self.current_stage.objects.append(self.ball2)
+        self.current_stage.add_object(self.ball)
+        self.current_stage.add_object(self.ball2)
+
+        # DEBUG: Per-phase frame profiler & its on-screen
+        #   overlay (the profiler is idle unless debugging)
+        self.profiler = FrameProfiler(enabled=con.DEBUG)
+        self.current_stage.profiler = self.profiler
+        self.console = DebugConsole(self.profiler) if con.DEBUG else None
+        self.console_rect = None
+
+        # Queue input is forwarded to the simulation process
+        #   through in split mode (see split_loop())
+        self.inputs = None
+
+        # Input logging/playback for reproducible runs
+        input_bus = self.current_stage.input_bus
+        if record is not None:
+            input_bus.recorder = InputRecorder(record)
+        if replay is not None:
+            input_bus.replayer = InputReplayer(replay)
+
+        # Per-frame metrics log, written in the background
+        if metrics is not None:
+            self.current_stage.metrics = MetricsAggregator(metrics)
 
     def event_loop(self):
         """
@@ -66,43 +105,248 @@ class App:
                 # Update key state
                 self.keys = pyg.key.get_pressed()
 
-                # Put a corresponding InputEvent onto
-                #   stage's input queue
-                self.current_stage.input_queue.put(InputEvent(event.type, event.key))
+                # Post a corresponding InputEvent to the
+                #   stage's input bus (or hand it to the
+                #   simulation process in split mode)
+                if self.inputs is not None:
+                    self.inputs.put((event.type, event.key))
+                else:
+                    self.current_stage.input_bus.post(InputEvent(event.type, event.key))
 
-    def render(self):
+    def render(self, alpha=1.0):
         """
         Draws to the screen and updates the display
+        (alpha is how far game time has advanced from the
+        last update toward the next, for interpolation)
         """
 		
-        # Draw level
-        self.current_stage.draw(self.screen)
+        # Keep the camera on the first ball, then draw level
+        self.current_stage.follow(self.ball)
+        dirty = self.current_stage.draw(self.screen, alpha)
 		
         # Draw game objects
+
+        # DEBUG: Draw profiler overlay on top (redrawing the
+        #   whole stage next frame if the overlay's size changed,
+        #   to clear what it covered)
+        if self.console is not None:
+            rect = self.console.draw(self.screen, len(self.current_stage.objects))
+            if rect != self.console_rect:
+                self.current_stage.renderer.reset()
+                self.console_rect = rect
+            if dirty is not None:
+                dirty.append(rect)
+        self.profiler.lap("draw")
         
-        # Update display 
-        pyg.display.flip()
+        # Update display (only the regions that changed, if
+        #   the stage reports them)
+        if dirty is None:
+            pyg.display.flip()
+        elif dirty:
+            pyg.display.update(dirty)
+        self.profiler.lap("flip")
 		
     def main_loop(self):
         """
-        Performs the main game loop
+        Performs the main game loop. Game objects are updated
+        at the fixed con.SIM_RATE no matter how long frames
+        take to render: elapsed time accumulates and is spent
+        in whole updates, and whatever is left over is used
+        to interpolate drawing between the last two updates
+        """
+        step = 1.0 / con.SIM_RATE
+        accumulator = 0.0
+        previous = default_timer()
+        while not self.done:
+            now = default_timer()
+            accumulator += now - previous
+            previous = now
+
+            self.profiler.begin_frame()
+            self.event_loop()
+            self.profiler.lap("event_loop")
+
+            # Update game objects, catching up on missed updates
+            #   up to a limit
+            updates = 0
+            while accumulator >= step and updates < con.MAX_UPDATES_PER_FRAME:
+                self.current_stage.update()
+                accumulator -= step
+                updates += 1
+            if accumulator >= step:
+                accumulator = 0.0
+
+            self.render(accumulator / step)
+            self.clock.tick(self.fps)
+
+        self.close_logs()
+
+    def split_loop(self, frames, inputs):
+        """
+        Performs the main game loop with the simulation
+        running in another process (see simulate()): input
+        is forwarded to it, and the stage's objects are
+        drawn straight from the latest SharedFrames buffer
+        it published, interpolated by how long ago it was
+        published. (DEBUG: predicted impact rects aren't
+        shared, so aren't drawn)
         """
+        engine = self.current_stage.engine
+        self.inputs = inputs
         while not self.done:
+            self.profiler.begin_frame()
             self.event_loop()
-            # Update game objects
-            self.current_stage.update()
-            self.render()
+            self.profiler.lap("event_loop")
+
+            slot = frames.acquire()
+            if slot is not None:
+                frames.attach(engine, slot)
+                self.render(min(1.0, frames.age(slot) * con.SIM_RATE))
+                frames.release()
             self.clock.tick(self.fps)
-			
+
+    def run_headless(self, frames):
+        """
+        Steps the current stage the given number of frames
+        as fast as the CPU allows, with no event handling,
+        rendering or frame rate cap. Returns the simulation
+        frame rate and the final state of every stage object
+        """
+        stage = self.current_stage
+        start = default_timer()
+        for frame in xrange(frames):
+            self.profiler.begin_frame()
+            stage.update()
+        self.profiler.begin_frame()
+        elapsed = default_timer() - start
+        fps = frames / elapsed if elapsed > 0 else float("inf")
+        self.close_logs()
+        return fps, stage.object_states()
+
+    def close_logs(self):
+        """
+        Closes the input log being recorded, if any, and
+        finishes the metrics log
+        """
+        input_bus = self.current_stage.input_bus
+        if input_bus.recorder is not None:
+            input_bus.recorder.close()
+            input_bus.recorder = None
+        self.current_stage.metrics.close()
+
+def headless(frames, vectorized=False, record=None, replay=None, metrics=None, level=None):
+    """
+    Runs the simulation for the given number of frames
+    without a real display (SDL's dummy video driver) and
+    returns what App.run_headless() does
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pyg.init()
+    pyg.display.set_mode(con.SCREEN_SIZE)
+    result = App(vectorized, record, replay, metrics, level).run_headless(frames)
+    pyg.quit()
+    return result
+
+def simulate(frames, inputs, done, record=None, replay=None, metrics=None, level=None):
+    """
+    Simulation side of split mode: steps the stage of an
+    App (built without a real display) at con.SIM_RATE,
+    delivering the input forwarded by the render process
+    and publishing every update to frames, until done is
+    set
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pyg.init()
+    pyg.display.set_mode(con.SCREEN_SIZE)
+    app = App(True, record, replay, metrics, level)
+    stage = app.current_stage
+    step = 1.0 / con.SIM_RATE
+    next_update = default_timer()
+    while not done.is_set():
+        while True:
+            try:
+                type, key = inputs.get_nowait()
+            except Queue.Empty:
+                break
+            stage.input_bus.post(InputEvent(type, key))
+        stage.update()
+        frames.publish(stage.engine, stage.frame)
+
+        # Wait for the next update, dropping the backlog if
+        #   updates fall too far behind
+        next_update += step
+        delay = next_update - default_timer()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -step * con.MAX_UPDATES_PER_FRAME:
+            next_update = default_timer()
+    app.close_logs()
+    pyg.quit()
+
+def split(record=None, replay=None, metrics=None, level=None):
+    """
+    Runs the game with simulation and rendering in two
+    processes, sharing object state through SharedFrames
+    (the simulation process is started before the display
+    is set up, so it inherits none of it)
+    """
+    frames = SharedFrames()
+    inputs = multiprocessing.Queue()
+    done = multiprocessing.Event()
+    process = multiprocessing.Process(target=simulate, args=(frames, inputs, done, record,
+                                                             replay, metrics, level))
+    process.start()
+    try:
+        pyg.init()
+        pyg.display.set_caption(con.WINDOW_CAPTION)
+        pyg.display.set_mode(con.SCREEN_SIZE)
+        App(True, level=level).split_loop(frames, inputs)
+    finally:
+        done.set()
+        process.join()
+    pyg.quit()
+
 def main():
     """
     Main program function. Performs Pygame initialization,
     starts, and exits the program.
     """
+    parser = argparse.ArgumentParser(description=con.WINDOW_CAPTION)
+    parser.add_argument("--headless", type=int, metavar="FRAMES",
+                        help="simulate FRAMES frames without a display and report FPS")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="step Balls with the batched physics engine")
+    parser.add_argument("--record", metavar="LOG",
+                        help="record input to the binary input log LOG")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="play input back from LOG instead of the keyboard")
+    parser.add_argument("--metrics", metavar="LOG",
+                        help="log per-frame stage metrics to LOG (JSON lines)")
+    parser.add_argument("--split", action="store_true",
+                        help="simulate in a second process, sharing state through shared "
+                             "memory (implies --vectorized)")
+    parser.add_argument("--level", metavar="LEVEL",
+                        help="load the binary level file LEVEL (see level.py)")
+    args = parser.parse_args()
+
+    if args.headless is not None:
+        fps, states = headless(args.headless, args.vectorized, args.record,
+                               args.replay, args.metrics, args.level)
+        print "Simulated %d frames at %.1f FPS" % (args.headless, fps)
+        print ("Image cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, "
+               "%(entries)d entries, %(bytes)d bytes" % assets.cache.stats())
+        for state in states:
+            print state
+        sys.exit()
+
+    if args.split:
+        split(args.record, args.replay, args.metrics, args.level)
+        sys.exit()
+
     pyg.init()
     pyg.display.set_caption(con.WINDOW_CAPTION)
     pyg.display.set_mode(con.SCREEN_SIZE)
-    App().main_loop()
+    App(args.vectorized, args.record, args.replay, args.metrics, args.level).main_loop()
     pyg.quit()
     sys.exit()
 	
@@ -0,0 +1,134 @@
+"""
+Module for the per-frame metrics aggregator. Each stage
+update records its objects' delta extremes, a histogram of
+their speeds, the number of sleeping objects and the
+number of floor bounces into a
+preallocated batch; full batches are handed to a
+background thread that writes them to a structured log
+(one JSON object per line), so no I/O happens on the
+update path
+"""
+import json
+import Queue
+import threading
+import numpy as np
+
+# Speed histogram bin edges (pixels per update); the last
+#   bin counts everything faster
+SPEED_BINS = np.array([0, 1, 2, 4, 8, 16, 32, 64], dtype=np.float64)
+
+# Layout of one frame's record
+FRAME_DTYPE = np.dtype([("frame", np.uint32), ("objects", np.uint32),
+                        ("sleeping", np.uint32), ("bounces", np.uint32),
+                        ("min_dx", np.float64), ("max_dx", np.float64),
+                        ("min_dy", np.float64), ("max_dy", np.float64),
+                        ("speeds", np.uint32, len(SPEED_BINS))])
+
+# Frames recorded per batch handed to the writer thread
+BATCH_FRAMES = 120
+
+class MetricsAggregator(object):
+    """
+    Collects per-frame stats in batches, keeps all-time
+    delta extremes, and (given a log path) writes every
+    batch from a background thread
+    """
+    def __init__(self, path=None, batch_frames=BATCH_FRAMES):
+        """
+        Allocates the first batch and starts the writer
+        thread if a log path is given
+        """
+        self.batch = np.zeros(batch_frames, dtype=FRAME_DTYPE)
+        self.size = 0
+
+        # All-time extremes of deltas in each cardinal
+        #   direction (leftmost dx, rightmost dx, dy up and
+        #   dy down)
+        self.max_dx_left = 0.0
+        self.max_dx_right = 0.0
+        self.max_dy_up = 0.0
+        self.max_dy_down = 0.0
+
+        # Full batches waiting for the writer thread
+        self.writer = None
+        if path is not None:
+            self.batches = Queue.Queue()
+            self.writer = threading.Thread(target=self.write, args=(path,))
+            self.writer.daemon = True
+            self.writer.start()
+
+    def record(self, frame, dx, dy, bounces, sleeping=0):
+        """
+        Records a frame's stats, given every object's
+        deltas (arrays), the number of floor bounces and
+        the number of sleeping objects
+        """
+        row = self.batch[self.size]
+        row["frame"] = frame
+        row["objects"] = len(dx)
+        row["sleeping"] = sleeping
+        row["bounces"] = bounces
+        if len(dx):
+            min_dx, max_dx = float(dx.min()), float(dx.max())
+            min_dy, max_dy = float(dy.min()), float(dy.max())
+            row["min_dx"], row["max_dx"] = min_dx, max_dx
+            row["min_dy"], row["max_dy"] = min_dy, max_dy
+            speed = np.sqrt(dx*dx + dy*dy)
+            row["speeds"] = np.bincount(np.searchsorted(SPEED_BINS, speed, "right") - 1,
+                                        minlength=len(SPEED_BINS))
+            self.max_dx_left = min(self.max_dx_left, min_dx)
+            self.max_dx_right = max(self.max_dx_right, max_dx)
+            self.max_dy_up = min(self.max_dy_up, min_dy)
+            self.max_dy_down = max(self.max_dy_down, max_dy)
+        else:
+            row["min_dx"] = row["max_dx"] = row["min_dy"] = row["max_dy"] = 0
+            row["speeds"] = 0
+        self.size += 1
+        if self.size == len(self.batch):
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the frames recorded so far to the writer (or
+        drops them, without one) and starts a new batch
+        """
+        if self.writer is not None and self.size:
+            self.batches.put(self.batch[:self.size])
+            self.batch = np.zeros(len(self.batch), dtype=FRAME_DTYPE)
+        self.size = 0
+
+    def close(self):
+        """
+        Flushes the last batch and waits for the writer to
+        finish the log
+        """
+        self.flush()
+        if self.writer is not None:
+            self.batches.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def extremes(self):
+        """
+        Returns the all-time delta extremes as a dict
+        """
+        return {"max_dx_left": self.max_dx_left, "max_dx_right": self.max_dx_right,
+                "max_dy_up": self.max_dy_up, "max_dy_down": self.max_dy_down}
+
+    def write(self, path):
+        """
+        Writer thread: logs the speed bins, then every
+        frame of every batch until close()
+        """
+        with open(path, "w") as log:
+            log.write(json.dumps({"speed_bins": SPEED_BINS.tolist()}) + "\n")
+            while True:
+                batch = self.batches.get()
+                if batch is None:
+                    break
+                for row in batch.tolist():
+                    frame, objects, sleeping, bounces, min_dx, max_dx, min_dy, max_dy, speeds = row
+                    log.write(json.dumps({"frame": frame, "objects": objects,
+                                          "sleeping": sleeping, "bounces": bounces, "dx": [min_dx, max_dx],
+                                          "dy": [min_dy, max_dy],
+                                          "speeds": speeds.tolist()}) + "\n")
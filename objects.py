@@ -1,6 +1,8 @@
-import Queue
 import pygame as pyg
 import constants as con
+import assets
+from components import GRAVITY, FRICTION, BOUNCE, INPUT
+from render import draw_outlines
 
 class CollisionEvent:
     """
@@ -8,6 +10,28 @@ class CollisionEvent:
     between objects to be queued for resolution
     next update
     """
+    def __init__(self, first, second, toi=0, along_x=False, normal=0):
+        """
+        Constructs a CollisionEvent between two objects
+        whose pushboxes touch (toi of 0) or are predicted
+        to meet toi of the way through the next update,
+        along the x axis or not, with normal giving the
+        side of first that second hits (-1 or 1)
+        """
+        self.first = first
+        self.second = second
+        self.toi = toi
+        self.along_x = along_x
+        self.normal = normal
+
+    def other(self, object):
+        """
+        Returns the object on the other side of the
+        collision from the one given
+        """
+        if object is self.first:
+            return self.second
+        return self.first
 
 class TypedRect(pyg.Rect):
     """
@@ -24,21 +48,72 @@ class TypedRect(pyg.Rect):
         super(TypedRect, self).__init__(x, y, width, height)
         self.type = type
 
-class MovableObject(pyg.sprite.Sprite):
+def body_field(name, array, cast):
+    """
+    Builds a property for a Ball member that reads and
+    writes through the Ball's physics engine arrays while
+    it is registered with one, and through a plain
+    instance attribute otherwise
     """
-    Generic Sprite object with a deltaX & a deltaY
+    local = "_" + name
+
+    def fget(self):
+        if self.engine is None:
+            return getattr(self, local)
+        return cast(getattr(self.engine, array)[self.engine_index])
+
+    def fset(self, value):
+        if self.engine is None:
+            setattr(self, local, value)
+        else:
+            getattr(self.engine, array)[self.engine_index] = value
+
+    return property(fget, fset)
+
+class MovableObject(object):
+    """
+    Generic game object with a deltaX & a deltaY
     property
+
+    Objects of this hierarchy have no __dict__: every
+    member is declared in its class's __slots__, keeping
+    stages of many objects compact
     """
+    __slots__ = ("deltaX", "deltaY", "image", "draw_rect", "pushbox", "clsn_queue",
+                 "stage", "engine", "engine_index", "prev_topleft", "asleep")
+
+    # Components this class has (see components.py), which
+    #   decide the stage systems that act on its objects
+    #   (none by default)
+    components = ()
+
+    # Keys whose KEYDOWN events the stage's input bus
+    #   hands to handle_input() (none by default)
+    input_keys = ()
+
     def __init__(self, stage, x=50, y=50):
-        super(MovableObject, self).__init__()
+        # Physics engine (and index into its arrays) that
+        #   steps this object, if any (see physics.py)
+        self.engine = None
+        self.engine_index = None
+
+        # Drawing rect position before the last stage
+        #   update (kept by the stage for interpolated
+        #   drawing)
+        self.prev_topleft = None
+
+        # Whether the stage has put the object to sleep (it
+        #   is skipped by updates until woken, see
+        #   PlayStage.wake())
+        self.asleep = False
 
         # Basic 2D speed dimensions
         self.deltaX = 5
         self.deltaY = 0
 
-        # Red surface as placeholder image
-        self.image = pyg.Surface((30, 50))
-        self.image.fill(con.RED)
+        # Red surface as placeholder image (shared between
+        #   objects, see assets.py)
+        self.image = assets.cache.placeholder((30, 50), con.RED)
 
         # Define the drawing rect
         self.draw_rect = self.image.get_rect()
@@ -52,13 +127,32 @@ class MovableObject(pyg.sprite.Sprite):
         self.pushbox.y = self.draw_rect.y
         
         # Collision queue used to store predicted 
-        #   collision events for processing
-        self.clsn_queue = Queue.Queue()
+        #   collision events for processing (a plain
+        #   list, as stages update on one thread, created
+        #   on first use by queue_collision())
+        self.clsn_queue = None
 
         # Reference to whatever stage the object
         #   inhabits (initially None)
         self.stage = stage
 
+    def queue_collision(self, event):
+        """
+        Queues a predicted CollisionEvent for processing
+        """
+        if self.clsn_queue is None:
+            self.clsn_queue = []
+        self.clsn_queue.append(event)
+
+    def drain_collisions(self):
+        """
+        Empties the collision queue, returning the events
+        it held in queued order
+        """
+        queue = self.clsn_queue or ()
+        self.clsn_queue = None
+        return queue
+
     def update(self):
         """
         Updates the object's game state
@@ -69,16 +163,35 @@ class MovableObject(pyg.sprite.Sprite):
         # Move along y-axis
         self.move_y()
 
-    def draw(self, screen):
+    def draw(self, screen, offset=(0, 0)):
         """
-        Draws the object's sprite to the screen
+        Draws the object's sprite to the screen, shifted by
+        offset (used to interpolate between updates)
         """
         # Blit sprite
-        screen.blit(self.image, self.draw_rect)
+        screen.blit(self.image, self.draw_rect.move(offset))
         # If in debug mode, draw collision rects
         if con.DEBUG:
-            pyg.draw.rect(screen, con.WHITE, self.draw_rect, 1)
-            pyg.draw.rect(screen, con.GREEN, self.pushbox, 1)
+            draw_outlines(screen, self.debug_rects(offset))
+
+    def debug_rects(self, offset=(0, 0)):
+        """
+        DEBUG: Returns the (color, rect) outlines drawn over
+        the sprite (drawing rect & pushbox), shifted by
+        offset (stages draw them in one batched pass, see
+        render.submit())
+        """
+        return [(con.WHITE, self.draw_rect.move(offset)),
+                (con.GREEN, self.pushbox.move(offset))]
+
+    def draw_area(self):
+        """
+        Returns the rect of the screen area draw() touches
+        (with no offset)
+        """
+        if con.DEBUG:
+            return self.draw_rect.union(self.pushbox)
+        return pyg.Rect(self.draw_rect)
 
     def move_x(self):
         """
@@ -100,6 +213,10 @@ class GravityObject(MovableObject):
     """
     Game object subject to gravity
     """
+    __slots__ = ("grav_modifier", "is_gravity")
+
+    components = (GRAVITY,)
+
     def __init__(self, stage):
         """
         Calls superconstructor and initializes 
@@ -125,6 +242,10 @@ class FrictionObject(GravityObject):
     Currently extends GravityObject, but I may change
        this later to only implement friction
     """
+    __slots__ = ("friction",)
+
+    components = (GRAVITY, FRICTION)
+
     def __init__(self, stage):
         """
         Calls superconstructor and initializes friction
@@ -155,7 +276,60 @@ class Ball(FrictionObject):
     basketball or volleyball, with light 
     weight and high elasticity (faked for
     simplicity of design)
+
+    While registered with a physics engine, the members
+    below are views into the engine's arrays. Rects
+    handed out by draw_rect and pushbox are refreshed
+    from the arrays on access; assign a new rect (rather
+    than mutating the returned one) to move the ball
     """
+    # Storage behind the members below while the ball
+    #   isn't registered with an engine (the slots of the
+    #   same names in the superclasses go unused)
+    __slots__ = ("_deltaX", "_deltaY", "_friction", "_proration", "_can_bounce",
+                 "_is_gravity", "_draw_rect", "_pushbox", "predict_rects")
+
+    components = (GRAVITY, FRICTION, BOUNCE, INPUT)
+
+    # DEBUG: Arrow keys push the ball around
+    input_keys = (pyg.K_UP, pyg.K_DOWN, pyg.K_LEFT, pyg.K_RIGHT)
+
+    deltaX = body_field("deltaX", "dx", float)
+    deltaY = body_field("deltaY", "dy", float)
+    friction = body_field("friction", "friction", float)
+    proration = body_field("proration", "proration", float)
+    can_bounce = body_field("can_bounce", "can_bounce", bool)
+    is_gravity = body_field("is_gravity", "is_gravity", bool)
+
+    def _get_draw_rect(self):
+        if self.engine is not None:
+            i = self.engine_index
+            self._draw_rect.x = self.engine.rx[i]
+            self._draw_rect.y = self.engine.ry[i]
+        return self._draw_rect
+
+    def _set_draw_rect(self, rect):
+        self._draw_rect = rect
+        if self.engine is not None:
+            i = self.engine_index
+            self.engine.rx[i], self.engine.ry[i], self.engine.rw[i], self.engine.rh[i] = rect
+
+    def _get_pushbox(self):
+        if self.engine is not None:
+            i = self.engine_index
+            self._pushbox.x = self.engine.x[i]
+            self._pushbox.y = self.engine.y[i]
+        return self._pushbox
+
+    def _set_pushbox(self, rect):
+        self._pushbox = rect
+        if self.engine is not None:
+            i = self.engine_index
+            self.engine.x[i], self.engine.y[i], self.engine.w[i], self.engine.h[i] = rect
+
+    draw_rect = property(_get_draw_rect, _set_draw_rect)
+    pushbox = property(_get_pushbox, _set_pushbox)
+
     def __init__(self, stage, x=50, y=50):
         """
         Loads ball image and sets rect to sprite
@@ -164,7 +338,7 @@ class Ball(FrictionObject):
         super(Ball, self).__init__(stage)
 
         # Redefine image member & drawing rect
-        self.image = pyg.image.load("img/ball.png").convert_alpha()
+        self.image = assets.cache.image("img/ball.png")
         self.draw_rect = self.image.get_rect()
         self.draw_rect.x = x
         self.draw_rect.y = y
@@ -175,12 +349,12 @@ class Ball(FrictionObject):
         self.pushbox.y = self.draw_rect.y
 
         # Set state flags & ball-specific physical members
-        self.input_queue = Queue.Queue()
         self.can_bounce = True
         self.friction = 0.03 # Decays ball's roll across the ground
         self.proration = 2 # Base decay applied to ball bounce off floor
-        self.predict_rects = [] # DEBUG: List of stepped positions for 
-                                #   collision prediction
+        self.predict_rects = () # DEBUG: Predicted impact & end positions
+                                #   of the pushbox (see clsn_predict(),
+                                #   which allocates them once)
 
         # Initialize dy to a positive value so ball starts falling
         #   if spawned in midair
@@ -190,36 +364,41 @@ class Ball(FrictionObject):
         """
         Moves ball and bounces it if it hits a
         stage boundary
+        (Balls registered with a physics engine are
+        stepped by the engine instead)
         """
-        # DEBUG: Update key state & handle input
-        self.handle_input()
-        
-        # DEBUG: Predict collisions here?
-        #self.clsn_predict()
+        # (DEBUG: Key input was already handled by the stage's
+        #   input bus this update, see handle_input())
 
         # Move along x-axis
+        old_x = self.pushbox.x
         self.move_x()
 
         # Check for collision (x-axis)
-        self.check_col_x()
+        self.check_col_x(old_x)
 
         # Move along y-axis
+        old_y = self.pushbox.y
         self.move_y()
 
         # Check for collision (y-axis)
-        self.check_col_y()
-        
-        # DEBUG: Predict collisions here?
-        self.clsn_predict()
-        
-    def draw(self, screen):
-        # Call parent draw()
-        super(Ball, self).draw(screen)
+        self.check_col_y(old_y)
+
+        # (Collisions along the next move are predicted for
+        #   all objects at once by the stage)
         
-        # Draw projection rects
-        if con.DEBUG:
-            for rect in self.predict_rects:
-                pyg.draw.rect(screen, con.RED, rect, 1)
+    def debug_rects(self, offset=(0, 0)):
+        # Call parent debug_rects(), adding projection rects
+        outlines = super(Ball, self).debug_rects(offset)
+        outlines.extend((con.RED, rect.move(offset)) for rect in self.predict_rects)
+        return outlines
+
+    def draw_area(self):
+        # Call parent draw_area(), adding projection rects
+        area = super(Ball, self).draw_area()
+        if con.DEBUG and self.predict_rects:
+            area.union_ip(area.unionall(self.predict_rects))
+        return area
 
     def apply_force(self, force, direction):
         """
@@ -227,6 +406,12 @@ class Ball(FrictionObject):
         in the specified direction (via string values
         'U', 'D', 'L', 'R' for up, down, left or right)
         """
+        # Wake the ball (and whatever rests on it) first,
+        #   and drop its predicted trajectory
+        if self.asleep:
+            self.stage.wake(self)
+        self.stage.trajectories.invalidate((self,))
+
         if direction == "U":
             self.deltaY -= force
             # If ball is unbounceable (grounded), make it
@@ -248,6 +433,7 @@ class Ball(FrictionObject):
 
         # Modify inverted deltaY by proration and proportion
         self.deltaY = -self.deltaY + self.proration
+        self.stage.bounces += 1
 
         # If modified dy is greater than or equal to 0,
         #   ball has insufficient force to bounce back up,
@@ -256,14 +442,39 @@ class Ball(FrictionObject):
             self.deltaY = 0
             self.can_bounce = False
 
-    def check_col_x(self):
+    def check_col_x(self, old_x=None):
         """
-        Checks for collisions along x-axis
+        Checks for collisions along x-axis (and with the
+        stage level's solid tiles, given the pushbox's x
+        before the move)
         """
         # Check ball collision here?
 
+        # Where the move first ran into a solid tile, if
+        #   that comes before any wall (NaN otherwise)
+        edge = float("nan")
+        moved_right = old_x is not None and self.pushbox.x > old_x
+        if old_x is not None and self.stage.level is not None:
+            pushbox = self.pushbox
+            edge = float(self.stage.level.sweep_x(old_x, pushbox.x, pushbox.y,
+                                                  pushbox.width, pushbox.height))
+            if not (edge < self.stage.right_wall if moved_right else edge > self.stage.left_wall):
+                edge = float("nan")
+
+        # Solid tile collision: stop at the tile's edge and
+        #   bounce off it like a wall
+        if edge == edge:
+            if moved_right:
+                self.draw_rect.right = edge
+                self.pushbox.right = edge
+                self.deltaX = -self.deltaX+self.proration
+            else:
+                self.draw_rect.left = edge
+                self.pushbox.left = edge
+                self.deltaX = -self.deltaX-self.proration
+
         # Left wall collision
-        if self.pushbox.left < self.stage.left_wall:
+        elif self.pushbox.left < self.stage.left_wall:
             # Set left edge to wall
             self.draw_rect.left = self.stage.left_wall
             self.pushbox.left = self.stage.left_wall
@@ -280,14 +491,35 @@ class Ball(FrictionObject):
             # Invert deltaX & decay by proration
             self.deltaX = -self.deltaX+self.proration
 
-    def check_col_y(self):
+    def check_col_y(self, old_y=None):
         """
-        Checks for collisions along y-axis
+        Checks for collisions along y-axis (and with the
+        stage level's solid tiles, given the pushbox's y
+        before the move)
         """
         # Check ball collision here?
+
+        # Whether the move first ran into a solid tile's top
+        #   before reaching the floor (landed), or its bottom
+        #   before reaching the ceiling (bumped), and where
+        edge = float("nan")
+        landed = bumped = False
+        if old_y is not None and self.stage.level is not None:
+            pushbox = self.pushbox
+            edge = float(self.stage.level.sweep_y(old_y, pushbox.y, pushbox.x,
+                                                  pushbox.width, pushbox.height))
+            landed = pushbox.y > old_y and edge < self.stage.floor
+            bumped = pushbox.y < old_y and edge > self.stage.ceiling
+
+        # Landing on a solid tile counts as a floor collision
+        if landed:
+            self.draw_rect.bottom = edge
+            self.pushbox.bottom = edge
+            if self.can_bounce:
+                self.bounce()
         
         # Floor collision
-        if self.pushbox.bottom > self.stage.floor:
+        elif self.pushbox.bottom > self.stage.floor:
             # Forcibly re-align pushbox & drawing rect
             #   to floor to prevent being at or below 
             #   floor for more than 1 frame
@@ -298,10 +530,18 @@ class Ball(FrictionObject):
             if self.can_bounce:
                 self.bounce()
 
-        # If ball is unbounceable,
-        #   apply friction to slow roll to a halt
+        # Only bounceable balls check the ceiling (grounded
+        #   ones roll to a halt under the stage's friction
+        #   system, see PlayStage.apply_friction())
         if not self.can_bounce:
-            self.apply_friction()
+            return
+
+        # Running into a solid tile from below is handled
+        #   like the ceiling
+        if bumped:
+            self.draw_rect.top = edge
+            self.pushbox.top = edge
+            self.deltaY = -self.deltaY-self.proration
                 
         # Ceiling collision
         elif self.pushbox.top < self.stage.ceiling:
@@ -312,46 +552,44 @@ class Ball(FrictionObject):
             # Invert deltaY & decay by proration
             self.deltaY = -self.deltaY-self.proration
             
-    def clsn_predict(self):
-        """
-        Predicts next update position and tests for 
-        collisions in intervals along the path to 
-        that position
-        """
-        # Purge contents of old prediction list
-        self.predict_rects = []
-        
-        # Make projection rects for quarter-steps to expected update position
-        rect1 = pyg.rect.Rect(self.pushbox.x+(0.25*self.deltaX), self.pushbox.y+(0.25*self.deltaY), self.pushbox.width, self.pushbox.height)
-        rect2 = pyg.rect.Rect(self.pushbox.x+(0.5*self.deltaX) , self.pushbox.y+(0.5*self.deltaY), self.pushbox.width, self.pushbox.height)
-        rect3 = pyg.rect.Rect(self.pushbox.x+(0.75*self.deltaX), self.pushbox.y+(0.75*self.deltaY), self.pushbox.width, self.pushbox.height)
-        rect4 = pyg.rect.Rect(self.pushbox.x+self.deltaX, self.pushbox.y+self.deltaY, self.pushbox.width, self.pushbox.height)
-        self.predict_rects.append(rect1)
-        self.predict_rects.append(rect2)
-        self.predict_rects.append(rect3)
-        self.predict_rects.append(rect4)
-
-    def handle_input(self):
+    def clsn_predict(self, toi=None):
+        """
+        DEBUG: Updates the prediction rects to show where
+        the pushbox will first collide during its next move
+        (toi, the fraction of the move at which the stage
+        predicts an impact, if any) and where it will end
+        up. Rects are reused from update to update
+        """
+        pushbox = self.pushbox
+        if not self.predict_rects:
+            self.predict_rects = [pyg.Rect(pushbox), pyg.Rect(pushbox)]
+        impact, end = self.predict_rects
+        end.x = pushbox.x + self.deltaX
+        end.y = pushbox.y + self.deltaY
+        if toi is None or toi > 1:
+            impact.topleft = end.topleft
+        else:
+            impact.x = pushbox.x + toi*self.deltaX
+            impact.y = pushbox.y + toi*self.deltaY
+
+    def handle_input(self, event):
         """
         Handles keyboard input just to test the
-        apply_force() method
-        """
-        # If input queue not empty, get latest event
-        if not self.input_queue.empty():
-            event = self.input_queue.get()
-
-            # Look at key value to determine direction
-            #   in which to apply force to the ball
-            if event.type == pyg.KEYDOWN:
-                if event.key == pyg.K_UP:
-                    #print "Up pressed"
-                    self.apply_force(8, "U")
-                elif event.key == pyg.K_DOWN:
-                    #print "Down pressed"
-                    self.apply_force(8, "D")
-                elif event.key == pyg.K_LEFT:
-                    #print "Left pressed"
-                    self.apply_force(8, "L")
-                elif event.key == pyg.K_RIGHT:
-                    #print "Right pressed"
-                    self.apply_force(8, "R")
+        apply_force() method (called by the stage's
+        input bus for every key in input_keys)
+        """
+        # Look at key value to determine direction
+        #   in which to apply force to the ball
+        if event.type == pyg.KEYDOWN:
+            if event.key == pyg.K_UP:
+                #print "Up pressed"
+                self.apply_force(8, "U")
+            elif event.key == pyg.K_DOWN:
+                #print "Down pressed"
+                self.apply_force(8, "D")
+            elif event.key == pyg.K_LEFT:
+                #print "Left pressed"
+                self.apply_force(8, "L")
+            elif event.key == pyg.K_RIGHT:
+                #print "Right pressed"
+                self.apply_force(8, "R")
@@ -0,0 +1,335 @@
+"""
+Module for the vectorized physics engine, which keeps
+the physical state of every Ball in a stage in contiguous
+NumPy arrays and steps all of them in one batched pass
+(mirrors the per-object rules in objects.Ball exactly,
+frame for frame)
+"""
+import numpy as np
+
+class BodyArrays(object):
+    """
+    Struct-of-arrays container for Ball state. Positions
+    are stored as floats but always hold whole numbers,
+    since Pygame rects truncate whatever is assigned
+    to them
+    """
+    # Float members: pushbox (x, y, w, h), drawing rect
+    #   (rx, ry, rw, rh) and its position before the last
+    #   stage update (px, py), deltas, ball physics values
+    #   and the predicted time of impact during the next step
+    FLOAT_FIELDS = ("x", "y", "w", "h", "rx", "ry", "rw", "rh", "px", "py",
+                    "dx", "dy", "friction", "proration", "toi")
+
+    # Boolean state flags
+    BOOL_FIELDS = ("can_bounce", "is_gravity")
+
+    def __init__(self, capacity=64):
+        """
+        Allocates zeroed arrays with room for capacity
+        bodies
+        """
+        self.count = 0
+        self.capacity = 0
+        self.resize(max(capacity, 1))
+
+    def resize(self, capacity):
+        """
+        Reallocates every array to the given capacity,
+        keeping the state of live bodies
+        """
+        n = self.count
+        for name in self.FLOAT_FIELDS:
+            array = np.zeros(capacity, dtype=np.float64)
+            if self.capacity:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        for name in self.BOOL_FIELDS:
+            array = np.zeros(capacity, dtype=np.bool_)
+            if self.capacity:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def gather(self, index):
+        """
+        Returns a copy of the bodies at the given indices
+        (in that order)
+        """
+        other = BodyArrays(len(index))
+        other.count = len(index)
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+            getattr(other, name)[:other.count] = getattr(self, name)[index]
+        return other
+
+    def scatter(self, index, other):
+        """
+        Writes bodies gathered from the given indices back
+        """
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+            getattr(self, name)[index] = getattr(other, name)[:other.count]
+
+    def copy(self):
+        """
+        Returns an independent copy of the live bodies
+        """
+        other = BodyArrays(self.count)
+        other.count = self.count
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+            getattr(other, name)[:self.count] = getattr(self, name)[:self.count]
+        return other
+
+def apply_gravity(bodies, gravity):
+    """
+    Batched PlayStage.apply_gravity(): adds stage gravity
+    to every gravity-subject body that is not at rest
+    vertically
+    """
+    n = bodies.count
+    dy = bodies.dy[:n]
+    falling = bodies.is_gravity[:n] & (dy != 0)
+    dy[falling] += gravity
+
+def roll(dx, friction):
+    """
+    Returns deltaX values decayed by friction toward (and
+    clamped at) zero, as FrictionObject.apply_friction()
+    does
+    """
+    return np.where(dx - friction > 0, dx - friction,
+                    np.where(dx + friction < 0, dx + friction, 0))
+
+def apply_friction(bodies):
+    """
+    Batched PlayStage.apply_friction(): rolls every
+    grounded body toward a halt under friction
+    """
+    n = bodies.count
+    dx = bodies.dx[:n]
+    rolling = ~bodies.can_bounce[:n]
+    dx[rolling] = roll(dx[rolling], bodies.friction[:n][rolling])
+
+def step_bodies(bodies, floor, ceiling, left_wall, right_wall, level=None):
+    """
+    Batched Ball.update() minus input handling: moves
+    every body along x and y, bouncing it off stage
+    boundaries (and the solid tiles of level, a
+    level.TileMap, if given). Returns the number of floor
+    bounces this step
+    """
+    n = bodies.count
+    x = bodies.x[:n]
+    y = bodies.y[:n]
+    w = bodies.w[:n]
+    h = bodies.h[:n]
+    rx = bodies.rx[:n]
+    ry = bodies.ry[:n]
+    rw = bodies.rw[:n]
+    rh = bodies.rh[:n]
+    dx = bodies.dx[:n]
+    dy = bodies.dy[:n]
+    proration = bodies.proration[:n]
+    can_bounce = bodies.can_bounce[:n]
+
+    # Move along x-axis (rects truncate toward zero)
+    old_x = x.copy()
+    np.trunc(x + dx, out=x)
+    np.trunc(rx + dx, out=rx)
+
+    # Solid tile run into, if it comes before any wall
+    #   (a tile edge found short of a wall is always hit
+    #   first; NaN edges compare False)
+    if level is not None:
+        edge = level.sweep_x(old_x, x, y, w, h)
+        right = (x > old_x) & (edge < right_wall)
+        left = (x < old_x) & (edge > left_wall)
+        tiled = right | left
+
+    # Left wall collision: set left edge to wall, invert
+    #   deltaX & decay by proration
+    walled = x < left_wall
+    if level is not None:
+        walled &= ~tiled
+    x[walled] = left_wall
+    rx[walled] = left_wall
+    dx[walled] = -dx[walled] - proration[walled]
+
+    # Right wall collision (only if left wall wasn't hit)
+    hit = ~walled & (x + w > right_wall)
+    if level is not None:
+        hit &= ~tiled
+    x[hit] = right_wall - w[hit]
+    rx[hit] = right_wall - rw[hit]
+    dx[hit] = -dx[hit] + proration[hit]
+
+    # Solid tile collision: stop at the tile's edge and
+    #   bounce off it like a wall
+    if level is not None:
+        x[right] = edge[right] - w[right]
+        rx[right] = edge[right] - rw[right]
+        dx[right] = -dx[right] + proration[right]
+        x[left] = edge[left]
+        rx[left] = edge[left]
+        dx[left] = -dx[left] - proration[left]
+
+    # Move along y-axis
+    old_y = y.copy()
+    np.trunc(y + dy, out=y)
+    np.trunc(ry + dy, out=ry)
+
+    # Solid tile run into, if it comes before the floor
+    #   (landing) or ceiling (bump)
+    if level is not None:
+        edge = level.sweep_y(old_y, y, x, w, h)
+        land = (y > old_y) & (edge < floor)
+        bump = (y < old_y) & (edge > ceiling)
+
+    # Floor collision: re-align rects to floor and bounce
+    #   if allowed
+    hit = y + h > floor
+    if level is not None:
+        hit &= ~land
+    y[hit] = floor - h[hit]
+    ry[hit] = floor - rh[hit]
+
+    # Landing on a solid tile counts as a floor collision,
+    #   while running into one from below is handled like
+    #   the ceiling (below)
+    if level is not None:
+        y[land] = edge[land] - h[land]
+        ry[land] = edge[land] - rh[land]
+        hit |= land
+    bouncing = hit & can_bounce
+    dy[bouncing] = -dy[bouncing] + proration[bouncing]
+
+    # Bodies with insufficient force to bounce back up
+    #   are declared grounded
+    grounded = bouncing & (dy >= 0)
+    dy[grounded] = 0
+    can_bounce[grounded] = False
+
+    # Ceiling collision (only checked while bounceable)
+    hit = can_bounce & (y < ceiling)
+    if level is not None:
+        bump &= can_bounce
+        hit &= ~bump
+    y[hit] = ceiling
+    ry[hit] = ceiling
+    dy[hit] = -dy[hit] - proration[hit]
+    if level is not None:
+        y[bump] = edge[bump]
+        ry[bump] = edge[bump]
+        dy[bump] = -dy[bump] - proration[bump]
+
+    return int(np.count_nonzero(bouncing))
+
+class PhysicsEngine(BodyArrays):
+    """
+    Owns the body arrays for one PlayStage and keeps track
+    of which Ball lives at which index. Registered Balls
+    become thin views into the arrays (see objects.Ball)
+    """
+    def __init__(self, stage, capacity=64):
+        """
+        Calls superconstructor and keeps a reference to the
+        stage whose boundaries bodies collide with
+        """
+        super(PhysicsEngine, self).__init__(capacity)
+        self.stage = stage
+
+        # Registered Balls, in index order
+        self.bodies = []
+
+    def add(self, ball):
+        """
+        Copies a Ball's current state into the arrays and
+        binds the Ball to its new index
+        """
+        if self.count == self.capacity:
+            self.resize(self.capacity * 2)
+        i = self.count
+        draw_rect = ball.draw_rect
+        pushbox = ball.pushbox
+        self.x[i], self.y[i], self.w[i], self.h[i] = pushbox
+        self.rx[i], self.ry[i], self.rw[i], self.rh[i] = draw_rect
+        self.px[i], self.py[i] = draw_rect.topleft
+        self.dx[i] = ball.deltaX
+        self.dy[i] = ball.deltaY
+        self.friction[i] = ball.friction
+        self.proration[i] = ball.proration
+        self.can_bounce[i] = ball.can_bounce
+        self.is_gravity[i] = ball.is_gravity
+        self.toi[i] = np.inf
+        self.count += 1
+        self.bodies.append(ball)
+        ball.engine = self
+        ball.engine_index = i
+
+    def remove(self, ball):
+        """
+        Unbinds a Ball, handing its state back to the Ball
+        itself, and closes the gap it leaves
+        """
+        i = ball.engine_index
+        draw_rect = ball.draw_rect
+        pushbox = ball.pushbox
+        state = dict((name, getattr(ball, name)) for name in
+                     ("deltaX", "deltaY", "friction", "proration",
+                      "can_bounce", "is_gravity"))
+        ball.engine = None
+        ball.engine_index = None
+        ball.draw_rect = draw_rect
+        ball.pushbox = pushbox
+        for name, value in state.items():
+            setattr(ball, name, value)
+
+        # Shift later bodies down a slot, so bodies stay in
+        #   the order they were added (the stage's object
+        #   order)
+        n = self.count
+        if i != n - 1:
+            for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+                array = getattr(self, name)
+                array[i:n - 1] = array[i + 1:n]
+        del self.bodies[i]
+        for moved in self.bodies[i:]:
+            moved.engine_index -= 1
+        self.count -= 1
+
+    def apply_gravity(self, gravity, index=None):
+        """
+        Applies stage gravity to every registered Ball (or
+        only those at the given indices)
+        """
+        if index is None:
+            apply_gravity(self, gravity)
+            return
+        dy = self.dy[index]
+        dy[self.is_gravity[index] & (dy != 0)] += gravity
+        self.dy[index] = dy
+
+    def apply_friction(self, index=None):
+        """
+        Applies friction to every grounded registered Ball
+        (or only those at the given indices)
+        """
+        if index is None:
+            apply_friction(self)
+            return
+        index = index[~self.can_bounce[index]]
+        self.dx[index] = roll(self.dx[index], self.friction[index])
+
+    def step(self, index=None):
+        """
+        Moves and collides every registered Ball (or only
+        those at the given indices) against the stage
+        boundaries and level
+        """
+        stage = self.stage
+        bounds = (stage.floor, stage.ceiling, stage.left_wall, stage.right_wall, stage.level)
+        if index is None:
+            return step_bodies(self, *bounds)
+        bodies = self.gather(index)
+        bounces = step_bodies(bodies, *bounds)
+        self.scatter(index, bodies)
+        return bounces
@@ -0,0 +1,226 @@
+"""
+Module for dirty-rectangle rendering: instead of wiping and
+redrawing the whole screen every frame, only the regions
+where something changed since the last frame are restored
+from a cached backdrop and redrawn, and only those regions
+are pushed to the display. Only objects inside the view of
+the stage's camera are drawn at all, so worlds many times
+the size of the screen cost what is on screen. Sprites are
+submitted in one Surface.blits() call per pass, with debug
+outlines drawn in one pass over them all
+"""
+import numpy as np
+import pygame as pyg
+import constants as con
+from collision import SpatialHash
+
+# Fraction of the screen area past which a frame's dirty
+#   rects are given up on in favor of a full redraw & flip
+#   (many small updates cost more than one big one)
+DIRTY_THRESHOLD = 0.35
+
+def draw_outlines(surface, outlines):
+    """
+    Draws the 1-pixel outlines of rects, given as (color,
+    rect) pairs (later ones on top)
+    """
+    draw_rect = pyg.draw.rect
+    for color, rect in outlines:
+        draw_rect(surface, color, rect, 1)
+
+def submit(screen, objects, slots, states, offset_x, offset_y):
+    """
+    Draws the objects at the given positions in objects, in
+    order, whose draw states (see PlayStage.draw_states(),
+    in screen coordinates) and offsets are given: every
+    sprite in one Surface.blits() call, then (DEBUG) every
+    collision rect outline in one draw_outlines() pass
+    """
+    if not len(slots):
+        return
+    slots = slots.tolist()
+    images = [objects[i].image for i in slots]
+    screen.blits(zip(images, states[:, 4:6].tolist()), False)
+    if con.DEBUG:
+        outlines = []
+        for i, x, y in zip(slots, offset_x.tolist(), offset_y.tolist()):
+            outlines.extend(objects[i].debug_rects((x, y)))
+        draw_outlines(screen, outlines)
+
+class Camera(object):
+    """
+    Viewport onto a stage's world: the area of the given
+    size whose top left corner is at (x, y) in world
+    coordinates, kept inside the world
+    """
+    def __init__(self, width, height):
+        """
+        Creates a view of the given size at the world's top
+        left corner (the world starts out just as big)
+        """
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+        self.world_width = width
+        self.world_height = height
+
+    def set_world(self, width, height):
+        """
+        Sets the size of the world, moving the view back
+        inside it. Returns whether the view moved
+        """
+        self.world_width = width
+        self.world_height = height
+        return self.move_to(self.x, self.y)
+
+    def move_to(self, x, y):
+        """
+        Moves the view's top left corner to (x, y), or as
+        close as the world's edges allow. Returns whether
+        the view moved
+        """
+        x = int(max(0, min(x, self.world_width - self.width)))
+        y = int(max(0, min(y, self.world_height - self.height)))
+        moved = (x, y) != (self.x, self.y)
+        self.x = x
+        self.y = y
+        return moved
+
+class DirtyRenderer(object):
+    """
+    Draws a stage's objects over its backdrop, remembering
+    the area each object covered on screen so the next frame
+    only touches the areas of objects that moved
+    """
+    def __init__(self, cell_size, threshold=DIRTY_THRESHOLD):
+        """
+        Sets up the grid used to find the objects under each
+        dirty rect and the dirty area threshold (a fraction
+        of the screen area)
+        """
+        self.threshold = threshold
+        self.grid = SpatialHash(cell_size)
+
+        # Screen, stage layout, camera position, and the
+        #   positions in the stage's objects & draw states
+        #   (see PlayStage.draw_states(), in screen
+        #   coordinates) of the objects drawn last frame
+        self.screen = None
+        self.layout_version = None
+        self.view = None
+        self.slots = None
+        self.states = None
+
+    def reset(self):
+        """
+        Forces a full redraw next frame
+        """
+        self.screen = None
+
+    def draw(self, screen, stage, alpha=1.0):
+        """
+        Draws what the stage's camera sees of stage
+        (interpolated alpha of the way between its last two
+        updates) to screen. Returns the list of rects that
+        changed, or None if the whole screen was redrawn and
+        should be flipped
+        """
+        objects = stage.objects
+        camera = stage.camera
+        view = (camera.x, camera.y)
+        slots, offset_x, offset_y, states = stage.view(
+            camera.x, camera.y, camera.x + camera.width, camera.y + camera.height, alpha)
+
+        # Shift from world to screen coordinates
+        offset_x -= camera.x
+        offset_y -= camera.y
+        states[:, 0::2] -= camera.x
+        states[:, 1::2] -= camera.y
+
+        # Full redraw on the first frame, a new screen,
+        #   whenever objects were added or removed or while
+        #   the camera scrolls
+        if (screen is not self.screen or self.states is None or
+                stage.layout_version != self.layout_version or view != self.view):
+            return self.full_redraw(screen, stage, slots, offset_x, offset_y, states)
+
+        # Match each object drawn now with its state last
+        #   frame, if it was drawn then
+        old_slots = self.slots
+        if len(old_slots):
+            match = np.minimum(np.searchsorted(old_slots, slots), len(old_slots) - 1)
+            seen = old_slots[match] == slots
+        else:
+            match = np.zeros(len(slots), dtype=int)
+            seen = np.zeros(len(slots), dtype=np.bool_)
+        old_states = self.states[match] if len(old_slots) else states
+
+        # Dirty rect of each changed object spans both where
+        #   it was drawn last frame and where it is now, and
+        #   objects that left the view leave their old area
+        #   dirty
+        changed = np.flatnonzero(~seen | (states != old_states).any(axis=1))
+        gone = np.ones(len(old_slots), dtype=np.bool_)
+        gone[match[seen]] = False
+        if not len(changed) and not gone.any():
+            return []
+        new = states[changed, :4]
+        old = np.where(seen[changed][:, None], old_states[changed, :4], new)
+        dirty = np.concatenate((np.concatenate((np.minimum(old[:, :2], new[:, :2]),
+                                                np.maximum(old[:, 2:], new[:, 2:])), axis=1),
+                                self.states[gone, :4]))
+
+        # Clip to screen, dropping rects that end up empty
+        width, height = screen.get_size()
+        np.clip(dirty, 0, [width, height, width, height], out=dirty)
+        dirty = dirty[(dirty[:, 2] > dirty[:, 0]) & (dirty[:, 3] > dirty[:, 1])]
+        dirty_area = ((dirty[:, 2] - dirty[:, 0]) * (dirty[:, 3] - dirty[:, 1])).sum()
+        if dirty_area > self.threshold * width * height:
+            return self.full_redraw(screen, stage, slots, offset_x, offset_y, states)
+        self.slots = slots
+        self.states = states
+        if not len(dirty):
+            return []
+
+        # Objects (possibly) under any dirty rect
+        areas = states[:, :4]
+        left, top, right, bottom = areas.T
+        self.grid.rebuild(left, top, right - left, bottom - top)
+        candidates = self.grid.query(dirty[:, 0], dirty[:, 1], dirty[:, 2] - dirty[:, 0],
+                                     dirty[:, 3] - dirty[:, 1])
+        near = areas[candidates]
+
+        # Restore each dirty rect from the backdrop and redraw,
+        #   in stage order, every object overlapping it
+        #   (clipped, so objects above the ones redrawn are
+        #   never painted over outside the rect)
+        backdrop = stage.backdrop
+        clip = screen.get_clip()
+        rects = []
+        for l, t, r, b in dirty.tolist():
+            rect = pyg.Rect(l, t, r - l, b - t)
+            rects.append(rect)
+            screen.set_clip(rect)
+            screen.blit(backdrop, rect, rect)
+            hit = candidates[(near[:, 0] < r) & (near[:, 2] > l) &
+                             (near[:, 1] < b) & (near[:, 3] > t)]
+            submit(screen, objects, slots[hit], states[hit], offset_x[hit], offset_y[hit])
+        screen.set_clip(clip)
+        return rects
+
+    def full_redraw(self, screen, stage, slots, offset_x, offset_y, states):
+        """
+        Redraws the backdrop and every object in view (at
+        the given positions in the stage's objects), and
+        records the new object states. Returns None (flip
+        the display)
+        """
+        screen.blit(stage.backdrop, (0, 0))
+        submit(screen, stage.objects, slots, states, offset_x, offset_y)
+        self.screen = screen
+        self.layout_version = stage.layout_version
+        self.view = (stage.camera.x, stage.camera.y)
+        self.slots = slots
+        self.states = states
+        return None
@@ -0,0 +1,164 @@
+"""
+Module for splitting simulation and rendering between two
+processes. The simulation process copies its physics
+engine's arrays into one of two buffers of shared memory
+after each update and publishes it with the update's
+frame counter; the render process points a mirror
+engine's arrays straight at the latest published buffer
+and draws from it, so no per-frame state is pickled and
+the render side copies nothing
+"""
+import time
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
+from physics import BodyArrays
+
+# Header entries: the latest published buffer & the one
+#   being read (-1 for none), then the frame counter &
+#   body count of each buffer
+LATEST = 0
+READING = 1
+FRAME = (2, 3)
+COUNT = (4, 5)
+HEADER_SIZE = 6
+
+# Bodies each buffer has room for by default
+CAPACITY = 1024
+
+class SharedFrames(object):
+    """
+    Double-buffered body arrays in shared memory, for one
+    writer (the simulation) and one reader (the renderer).
+    The writer always fills the buffer that isn't the
+    latest one, and skips publishing while the reader still
+    holds it; the lock only guards handing buffers over,
+    never the copying or drawing
+    """
+    def __init__(self, capacity=CAPACITY):
+        """
+        Allocates two buffers with room for capacity
+        bodies each
+        """
+        self.capacity = capacity
+        self.lock = multiprocessing.Lock()
+        self.header = RawArray(ctypes.c_int64, HEADER_SIZE)
+        self.header[LATEST] = self.header[READING] = -1
+
+        # Wall-clock time (time.time()) each buffer was
+        #   published at, for interpolation
+        self.times = RawArray(ctypes.c_double, 2)
+
+        # Per buffer, one block holding every float field
+        #   and one holding every bool field
+        self.floats = [RawArray(ctypes.c_double, capacity * len(BodyArrays.FLOAT_FIELDS))
+                       for i in range(2)]
+        self.bools = [RawArray(ctypes.c_bool, capacity * len(BodyArrays.BOOL_FIELDS))
+                      for i in range(2)]
+        self.views = self.build_views()
+
+    def __getstate__(self):
+        """
+        Hands the shared blocks (but not the NumPy views
+        into them) to a child process
+        """
+        state = dict(self.__dict__)
+        del state["views"]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Rebuilds the NumPy views in a child process
+        """
+        self.__dict__.update(state)
+        self.views = self.build_views()
+
+    def build_views(self):
+        """
+        Returns a BodyArrays per buffer whose arrays are
+        views into the shared blocks
+        """
+        views = []
+        for floats, bools in zip(self.floats, self.bools):
+            view = BodyArrays(1)
+            fields = np.frombuffer(floats, dtype=np.float64).reshape(-1, self.capacity)
+            for name, array in zip(BodyArrays.FLOAT_FIELDS, fields):
+                setattr(view, name, array)
+            fields = np.frombuffer(bools, dtype=np.bool_).reshape(-1, self.capacity)
+            for name, array in zip(BodyArrays.BOOL_FIELDS, fields):
+                setattr(view, name, array)
+            view.capacity = self.capacity
+            views.append(view)
+        return views
+
+    def publish(self, bodies, frame):
+        """
+        Copies the live bodies of a BodyArrays (such as a
+        PhysicsEngine) into the free buffer and makes it
+        the latest, stamped with frame. Returns False
+        (publishing nothing) if the reader still holds the
+        free buffer
+        """
+        n = bodies.count
+        if n > self.capacity:
+            raise ValueError("%d bodies don't fit in %d shared slots" % (n, self.capacity))
+        header = self.header
+        with self.lock:
+            slot = 1 - header[LATEST] if header[LATEST] >= 0 else 0
+            if header[READING] == slot:
+                return False
+        view = self.views[slot]
+        for name in BodyArrays.FLOAT_FIELDS + BodyArrays.BOOL_FIELDS:
+            getattr(view, name)[:n] = getattr(bodies, name)[:n]
+        with self.lock:
+            header[FRAME[slot]] = frame
+            header[COUNT[slot]] = n
+            self.times[slot] = time.time()
+            header[LATEST] = slot
+        return True
+
+    def acquire(self):
+        """
+        Takes hold of the latest buffer until release().
+        Returns its index, or None if nothing has been
+        published yet
+        """
+        header = self.header
+        with self.lock:
+            slot = header[LATEST]
+            if slot < 0:
+                return None
+            header[READING] = slot
+        return slot
+
+    def release(self):
+        """
+        Lets the writer reuse the buffer last acquired
+        """
+        with self.lock:
+            self.header[READING] = -1
+
+    def frame(self, slot):
+        """
+        Returns the frame counter a buffer was published
+        with
+        """
+        return self.header[FRAME[slot]]
+
+    def age(self, slot):
+        """
+        Returns how many seconds ago a buffer was published
+        """
+        return time.time() - self.times[slot]
+
+    def attach(self, engine, slot):
+        """
+        Points a (mirror) engine's arrays at a buffer,
+        without copying
+        """
+        view = self.views[slot]
+        for name in BodyArrays.FLOAT_FIELDS + BodyArrays.BOOL_FIELDS:
+            setattr(engine, name, getattr(view, name))
+        engine.capacity = self.capacity
+        engine.count = self.header[COUNT[slot]]
@@ -0,0 +1,122 @@
+"""
+Module for the binary stage snapshot format and the ring
+buffer of recent snapshots used for rollback. A snapshot
+is a header (magic, format version, stage counters &
+boundaries, record counts) followed by one fixed-size
+record per object and one per queued CollisionEvent, so
+saving or restoring a stage is a handful of array copies
+rather than a deep copy of its objects
+"""
+import struct
+import numpy as np
+
+SNAPSHOT_MAGIC = "SNAP"
+SNAPSHOT_VERSION = 1
+
+# Header: magic & version, then the stage's frame, bounce
+#   count, gravity & boundaries (floor, ceiling, left and
+#   right wall) and the number of object & event records
+SNAPSHOT_HEADER = struct.Struct("<4sHIIdiiiiII")
+
+# Columns of an object's rest state (see
+#   PlayStage.rest_state())
+REST_STATE_SIZE = 7
+
+# Layout of one object's record: the same members as
+#   physics.BodyArrays (drawing rect position before the
+#   last update in px & py), plus its activity state
+OBJECT_DTYPE = np.dtype([("x", "<f8"), ("y", "<f8"), ("w", "<f8"), ("h", "<f8"),
+                         ("rx", "<f8"), ("ry", "<f8"), ("rw", "<f8"), ("rh", "<f8"),
+                         ("px", "<f8"), ("py", "<f8"), ("dx", "<f8"), ("dy", "<f8"),
+                         ("friction", "<f8"), ("proration", "<f8"), ("toi", "<f8"),
+                         ("can_bounce", "?"), ("is_gravity", "?"), ("asleep", "?"),
+                         ("rest_frames", "<i4"), ("last_state", "<f8", REST_STATE_SIZE)])
+
+# Layout of one queued CollisionEvent's record (objects
+#   given by their positions in the stage's objects, and
+#   woken set for events of objects woken since the last
+#   collision detection, see PlayStage.wake_events)
+EVENT_DTYPE = np.dtype([("first", "<u4"), ("second", "<u4"), ("toi", "<f8"),
+                        ("along_x", "?"), ("normal", "<f8"), ("woken", "?")])
+
+# Snapshots kept by a StateRing by default (a second's
+#   worth of updates)
+RING_FRAMES = 60
+
+def pack(frame, bounces, gravity, bounds, objects, events):
+    """
+    Returns a snapshot of the given stage counters and
+    boundaries (floor, ceiling, left & right wall) and
+    object & event records, as a string
+    """
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, frame, bounces, gravity,
+                                  *(tuple(bounds) + (len(objects), len(events))))
+    return header + objects.tobytes() + events.tobytes()
+
+def unpack(data):
+    """
+    Returns the stage frame, bounce count, gravity,
+    boundaries and object & event records of a snapshot
+    (the records are read-only views into data)
+    """
+    fields = SNAPSHOT_HEADER.unpack_from(data)
+    magic, version, frame, bounces, gravity = fields[:5]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("not a version %d stage snapshot" % SNAPSHOT_VERSION)
+    bounds = fields[5:9]
+    object_count, event_count = fields[9:]
+    offset = SNAPSHOT_HEADER.size
+    objects = np.frombuffer(data, OBJECT_DTYPE, object_count, offset)
+    offset += object_count * OBJECT_DTYPE.itemsize
+    events = np.frombuffer(data, EVENT_DTYPE, event_count, offset)
+    return frame, bounces, gravity, bounds, objects, events
+
+class StateRing(object):
+    """
+    Ring buffer of the snapshots of a stage's last few
+    updates, keyed by frame, for rolling the stage back
+    (say, to apply input that arrived late) and simulating
+    forward again
+    """
+    def __init__(self, frames=RING_FRAMES):
+        """
+        Creates an empty ring holding the snapshots of at
+        most the given number of frames
+        """
+        self.snapshots = [None] * frames
+        self.frames = np.full(frames, -1, dtype=np.int64)
+
+    def save(self, stage):
+        """
+        Stores a snapshot of stage under its current frame
+        (replacing the oldest one)
+        """
+        slot = stage.frame % len(self.snapshots)
+        self.snapshots[slot] = stage.save_state()
+        self.frames[slot] = stage.frame
+
+    def get(self, frame):
+        """
+        Returns the snapshot stored for frame, or None if
+        it has been overwritten (or never stored)
+        """
+        slot = frame % len(self.snapshots)
+        if self.frames[slot] != frame:
+            return None
+        return self.snapshots[slot]
+
+    def rollback(self, stage, frame):
+        """
+        Restores stage to the start of the given frame and
+        drops the snapshots of later frames (they are saved
+        again as the stage updates). Raises ValueError if
+        the frame is no longer held
+        """
+        snapshot = self.get(frame)
+        if snapshot is None:
+            raise ValueError("no snapshot held for frame %d" % frame)
+        stage.restore_state(snapshot)
+        later = self.frames > frame
+        self.frames[later] = -1
+        for slot in np.flatnonzero(later).tolist():
+            self.snapshots[slot] = None
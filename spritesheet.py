@@ -8,8 +8,10 @@ Credit for original implementation goes to
 Paul Vincent Craven at
 programarcadegames.com
 """
+import numpy as np
 import pygame as pyg
 import constants as con
+import assets
 
 class SpriteSheet(object):
     """
@@ -21,7 +23,10 @@ class SpriteSheet(object):
         Construct a SpriteSheet from image at file 
         path (filename) and convert pixel format
         """
-        self.sprite_sheet = pyg.image.load(filename).convert()
+        self.sprite_sheet = assets.cache.image(filename, alpha=False)
+
+        # Images already sliced, by (x, y, width, height)
+        self.images = {}
         
     def get_image(self, x, y, width, height):
         """
@@ -29,12 +34,108 @@ class SpriteSheet(object):
         Parameters: (x,y) for origin of the frame you wish
         to slice, and (width, height) for the dimensions of
         your desired slice
+        Slices are cached, so repeated calls return the same
+        (shared) Surface
         """
+        key = (x, y, width, height)
+        if key in self.images:
+            return self.images[key]
         image = pyg.Surface([width, height]).convert()
         image.blit(self.sprite_sheet, (0,0), (x, y, width, height))
         
         # DEBUG: Transparency is color-keyed to a particular value
         #   (may change this later to alpha-based)
         image.set_colorkey(con.ALPHA_COLOR)
-        
-        return image
\ No newline at end of file
+
+        self.images[key] = image
+        return image
+
+class FrameAtlas(object):
+    """
+    Every animation frame of a character definition (such
+    as constants.PHOEBE), sliced once from its spritesheet
+    along with its horizontally mirrored version. Frame
+    hitboxes are parsed once into flat arrays, so playing
+    an animation back is just indexing
+    """
+    def __init__(self, character):
+        """
+        Slices NUM_OF_FRAMES frames of IMAGE_WIDTH by
+        IMAGE_HEIGHT laid left to right across the
+        spritesheet, and flattens the ANIMS definitions
+        """
+        width = character["IMAGE_WIDTH"]
+        height = character["IMAGE_HEIGHT"]
+        count = character["NUM_OF_FRAMES"]
+        anims = character["ANIMS"][:count]
+        sheet = SpriteSheet(character["SPRITESHEET"])
+        self.width = width
+        self.height = height
+
+        # Frame images facing right (as drawn on the sheet)
+        #   and left (mirrored)
+        self.images = [sheet.get_image(i*width, 0, width, height) for i in xrange(count)]
+        self.flipped = [pyg.transform.flip(image, True, False) for image in self.images]
+
+        # Frame indices by name, and drawing axes (mirrored
+        #   around the frame's center when facing left)
+        self.index = dict((anim[0], i) for i, anim in enumerate(anims))
+        self.axes = np.array([anim[1] for anim in anims], dtype=np.int32)
+        self.flipped_axes = width - self.axes
+
+        # Hitboxes of every frame back to back: frame i owns
+        #   rows box_start[i] up to box_start[i + 1] of the
+        #   type codes (index into con.BOX_TYPES) & rects arrays
+        boxes = [box for anim in anims for box in anim[2:]]
+        sizes = [len(anim) - 2 for anim in anims]
+        self.box_start = np.concatenate(([0], np.cumsum(sizes))).astype(np.int32)
+        self.box_types = np.array([con.BOX_TYPES.index(box[0]) for box in boxes], dtype=np.int8)
+        self.box_rects = np.array([box[1:] for box in boxes], dtype=np.int32).reshape(-1, 4)
+        self.flipped_rects = self.box_rects.copy()
+        self.flipped_rects[:, 0] = width - self.box_rects[:, 0] - self.box_rects[:, 2]
+
+    def __len__(self):
+        return len(self.images)
+
+    def image(self, frame, facing_left=False):
+        """
+        Returns the image of a frame (by index)
+        """
+        if facing_left:
+            return self.flipped[frame]
+        return self.images[frame]
+
+    def axis(self, frame, facing_left=False):
+        """
+        Returns the drawing axis of a frame
+        """
+        if facing_left:
+            return self.flipped_axes[frame]
+        return self.axes[frame]
+
+    def boxes(self, frame, facing_left=False, type=None):
+        """
+        Returns an (n, 4) array with the x, y, width and
+        height (relative to the frame) of the hitboxes of a
+        frame, only those of the given type name if any
+        """
+        start = self.box_start[frame]
+        end = self.box_start[frame + 1]
+        rects = self.flipped_rects if facing_left else self.box_rects
+        rects = rects[start:end]
+        if type is not None:
+            rects = rects[self.box_types[start:end] == con.BOX_TYPES.index(type)]
+        return rects
+
+# Atlases already built, by spritesheet path
+atlases = {}
+
+def get_atlas(character):
+    """
+    Returns the (shared) FrameAtlas of a character
+    definition, building it on first use
+    """
+    path = character["SPRITESHEET"]
+    if path not in atlases:
+        atlases[path] = FrameAtlas(character)
+    return atlases[path]
\ No newline at end of file
@@ -12,11 +12,19 @@ Paul Vincent Craven at
 programarcadegames.com
 """
 
-import Queue
+import numpy as np
 import pygame as pyg
 import constants as con
-from input import InputEvent
+from input import InputBus
 from objects import *
+from physics import PhysicsEngine
+from collision import SpatialHash, ImpulseSolver, sweep, touching, boundary_toi, islands
+from render import DirtyRenderer, Camera
+from debug import FrameProfiler
+from metrics import MetricsAggregator
+from components import ComponentIndex, COMPONENTS, GRAVITY, FRICTION, BOUNCE, INPUT
+from snapshot import pack, unpack, OBJECT_DTYPE, EVENT_DTYPE, REST_STATE_SIZE
+import trajectory
 
 """
 Stage constants defined up here
@@ -31,6 +39,98 @@ TESTSTAGE = {
     "GRAVITY"    : 0.35
 }
 
+# Cell size of the ball-to-ball collision broad phase
+#   (about twice the size of a ball)
+CLSN_CELL_SIZE = 64
+
+# Max iterations spent separating overlapping objects
+#   each update
+CLSN_ITERATIONS = 4
+
+# Cell size of the grid sleeping objects are looked up in
+#   when drawing only what the camera sees (a fraction of
+#   the screen, so a view covers few cells)
+VIEW_CELL_SIZE = 256
+
+# Updates an object's state (position, deltas & bounce
+#   flag) has to stay unchanged before it may be put to
+#   sleep
+SLEEP_FRAMES = 30
+
+class Activity(object):
+    """
+    Which of a stage's objects are awake and which are
+    asleep, for one stage layout & sleeping set (see
+    PlayStage.activity())
+    """
+    def __init__(self, stage, key):
+        """
+        Splits stage's objects into awake & sleeping ones,
+        and groups the sleeping ones into islands
+        """
+        self.key = key
+        objects = stage.objects
+        asleep = stage.asleep[:len(objects)]
+        engine = stage.engine
+        engine_slot = stage.engine_slots()
+
+        # Awake objects: their positions in objects, the
+        #   objects, the engine indices of those it steps
+        #   (and the same as step_index, or None if it steps
+        #   all of its bodies) and the others
+        self.awake_slots = np.flatnonzero(~asleep)
+        self.awake = [objects[i] for i in self.awake_slots.tolist()]
+        index = engine_slot[self.awake_slots]
+        self.awake_index = index[index >= 0]
+        self.step_index = None
+        if engine is None or len(self.awake_index) < engine.count:
+            self.step_index = self.awake_index
+        self.awake_unbound = [object for object in self.awake if object.engine is None]
+
+        # Awake objects the engine doesn't step, and the
+        #   engine indices of those it does (None where that's
+        #   every body it holds, as for step_index), per
+        #   component (for the systems to loop over)
+        masks = stage.components().masks
+        unbound_slots = self.awake_slots[index < 0]
+        self.unbound_members = dict(
+            (name, [objects[i] for i in unbound_slots[masks[name][unbound_slots]].tolist()])
+            for name in COMPONENTS)
+        bound_slots = self.awake_slots[index >= 0]
+        self.bound_members = {}
+        for name in COMPONENTS:
+            members = self.awake_index[masks[name][bound_slots]]
+            if engine is not None and len(members) == engine.count:
+                members = None
+            self.bound_members[name] = members
+
+        # Whether the engine steps every awake object
+        self.bound = engine is not None and not self.awake_unbound
+
+        # Sleeping objects and their body arrays (which
+        #   can't change while they sleep, see
+        #   PlayStage.body_arrays())
+        self.sleep_slots = np.flatnonzero(asleep)
+        self.sleeping = [objects[i] for i in self.sleep_slots.tolist()]
+        self.sleep_position = dict((id(object), k) for k, object in enumerate(self.sleeping))
+        index = engine_slot[self.sleep_slots]
+        self.sleep_bodies = stage.body_arrays(
+            self.sleeping, index if engine is not None and (index >= 0).all() else None)
+
+        # Islands: sleepers that would collide with each
+        #   other if awake (see sleep_pairs) share a label,
+        #   and wake together
+        x, y, w, h, dx, dy = stage.motion(*self.sleep_bodies)
+        first, second = stage.sleep_grid.swept_pairs(x, y, w, h, dx, dy)
+        self.sleep_pairs = stage.narrow_phase(first, second, x, y, w, h, dx, dy)
+        self.islands = islands(len(self.sleeping), *self.sleep_pairs[:2])
+
+        # Draw states of the sleepers (which can't change
+        #   while they sleep) and a grid of their draw areas,
+        #   built on first use (see PlayStage.view())
+        self.view_states = None
+        self.view_grid = None
+
 class Stage(object):
     """
     Generic stage superclass. Has basic functionality
@@ -43,7 +143,7 @@ class Stage(object):
         """
         self.background = pyg.Surface([con.SCREEN_WIDTH, con.SCREEN_HEIGHT])
         self.background.fill(con.BG_COLOR)
-        self.input_queue = Queue.Queue()
+        self.input_bus = InputBus()
         
     def draw(self, screen):
         """
@@ -57,10 +157,13 @@ class PlayStage(Stage):
     A Stage meant to manage gameplay objects, including 
     player characters, background objects, etc.
     """
-    def __init__(self, stage):
+    def __init__(self, stage, vectorized=False):
         """
         Calls superconstructor and defines floor,
         ceiling, and wall values
+        If vectorized is set, Balls added through
+        add_object() are stepped in one batched pass
+        by a PhysicsEngine
         """
         super(PlayStage, self).__init__()
 
@@ -73,78 +176,1108 @@ class PlayStage(Stage):
         # Universal stage gravity
         self.gravity = stage["GRAVITY"]
 
-        # DEBUG: Track max dx/dy achieved by a ball
-        self.max_ever_dx_right = 0
-        self.max_ever_dx_left =  0
-        self.max_ever_dy_up =    0
-        self.max_ever_dy_down =  0
+        # Optional level geometry (a level.TileMap whose
+        #   solid tiles objects collide with inside the
+        #   boundaries, see set_level())
+        self.level = None
+
+        # Number of updates run so far (timestamps input)
+        self.frame = 0
+
+        # Times update steps (disabled unless the game
+        #   hands the stage an enabled one)
+        self.profiler = FrameProfiler(enabled=False)
+
+        # Per-frame stats (delta extremes, speeds & floor
+        #   bounces, counted in bounces during each update),
+        #   logged in the background if given a log path
+        self.metrics = MetricsAggregator()
+        self.bounces = 0
         
         # Instantiate test objects here
         self.objects = []
 
+        # Optional batched physics for Balls
+        self.engine = PhysicsEngine(self) if vectorized else None
+
+        # Broad phase for object-to-object collisions, and
+        #   objects with CollisionEvents queued for
+        #   resolution next update
+        self.broad_phase = SpatialHash(CLSN_CELL_SIZE)
+        self.clsn_pending = []
+
+        # Narrow phase & response for queued collisions
+        self.solver = ImpulseSolver(CLSN_ITERATIONS)
+
+        # Viewport onto the stage's world (which may be many
+        #   times the size of the screen), see scroll_to()
+        self.camera = Camera(con.SCREEN_WIDTH, con.SCREEN_HEIGHT)
+        self.camera.set_world(*self.world_size())
+
+        # Background of the camera's view with the stage
+        #   boundaries baked in, restored under whatever
+        #   moves each frame
+        self.backdrop = self.build_backdrop()
+
+        # Dirty-rect renderer, and a counter bumped whenever
+        #   objects are added or removed (invalidates the
+        #   renderer's last frame & the engine slot cache)
+        self.renderer = DirtyRenderer(CLSN_CELL_SIZE)
+        self.layout_version = 0
+        self.slot_cache = None
+
+        # ComponentIndex of the current layout (see
+        #   components())
+        self.component_cache = None
+
+        # Activity: objects whose state stays unchanged for
+        #   SLEEP_FRAMES updates fall asleep, and updates
+        #   skip them until they are woken (see wake()).
+        #   asleep, rest_frames & last_state hold a flag,
+        #   a counter and the state of the last update per
+        #   object (in objects order, grown as needed),
+        #   activity_version is bumped whenever the sleeping
+        #   set changes, and sleep_grid holds the areas the
+        #   sleepers would sweep
+        self.asleep = np.zeros(16, dtype=np.bool_)
+        self.rest_frames = np.zeros(16, dtype=np.int32)
+        self.last_state = np.full((16, REST_STATE_SIZE), np.nan)
+        self.activity_version = 0
+        self.activity_cache = None
+        self.sleep_grid = SpatialHash(CLSN_CELL_SIZE)
+
+        # Colliding pairs of awake objects (as indices into
+        #   the Activity's awake list) found by the last
+        #   detect_collisions(), keyed by that Activity
+        self.awake_pairs = (None, None, None)
+
+        # CollisionEvents between objects woken since the
+        #   last detect_collisions() (which only queues
+        #   collisions of awake objects), resolved next
+        #   update unless detect_collisions() finds them
+        #   first
+        self.wake_events = []
+
+        # Optional snapshot.StateRing given a snapshot of the
+        #   stage at the start of every update, for rollback
+        self.history = None
+
+        # Balls' predicted trajectories (see predict())
+        self.trajectories = trajectory.TrajectoryCache()
+
+    def add_object(self, object):
+        """
+        Adds a game object to the stage, registering it
+        with the physics engine if it is a Ball and the
+        stage is vectorized
+        """
+        self.objects.append(object)
+        object.prev_topleft = object.draw_rect.topleft
+        n = len(self.objects)
+        if n > len(self.asleep):
+            self.asleep = np.concatenate((self.asleep, np.zeros(n, dtype=np.bool_)))
+            self.rest_frames = np.concatenate((self.rest_frames, np.zeros(n, dtype=np.int32)))
+            self.last_state = np.concatenate((self.last_state,
+                                              np.full((n, REST_STATE_SIZE), np.nan)))
+        self.asleep[n - 1] = object.asleep = False
+        self.rest_frames[n - 1] = 0
+        self.last_state[n - 1] = np.nan
+        if INPUT in object.components:
+            self.input_bus.subscribe(object.handle_input, pyg.KEYDOWN, object.input_keys)
+        if self.engine is not None and isinstance(object, Ball):
+            self.engine.add(object)
+        self.layout_version += 1
+
+    def remove_object(self, object):
+        """
+        Removes a game object from the stage (waking
+        whatever sleeping objects it touched)
+        """
+        self.wake(object)
+        self.wake_events = [event for event in self.wake_events
+                            if object is not event.first and object is not event.second]
+
+        # Drop the collisions queued with it for next update
+        object.clsn_queue = None
+        self.clsn_pending = [other for other in self.clsn_pending if other is not object]
+        for other in self.clsn_pending:
+            if other.clsn_queue:
+                other.clsn_queue = [event for event in other.clsn_queue
+                                    if object is not event.first and object is not event.second]
+        if object.engine is not None:
+            object.engine.remove(object)
+        if INPUT in object.components:
+            self.input_bus.unsubscribe(object.handle_input)
+        self.trajectories.invalidate((object,))
+        i = self.objects.index(object)
+        del self.objects[i]
+        n = len(self.objects)
+        self.asleep[i:n] = self.asleep[i + 1:n + 1]
+        self.rest_frames[i:n] = self.rest_frames[i + 1:n + 1]
+        self.last_state[i:n] = self.last_state[i + 1:n + 1]
+        self.layout_version += 1
+
+    def slots(self):
+        """
+        Returns the positions in objects of engine-stepped
+        objects, their engine indices, and the positions of
+        all other objects (cached until the layout changes)
+        """
+        if self.slot_cache is None or self.slot_cache[0] != self.layout_version:
+            bound = [i for i, object in enumerate(self.objects) if object.engine is not None]
+            index = [self.objects[i].engine_index for i in bound]
+            unbound = [i for i, object in enumerate(self.objects) if object.engine is None]
+            engine_slot = np.full(len(self.objects), -1, dtype=int)
+            engine_slot[bound] = index
+            self.slot_cache = (self.layout_version, np.array(bound, dtype=int),
+                               np.array(index, dtype=int), unbound, engine_slot)
+        return self.slot_cache[1:4]
+
+    def components(self):
+        """
+        Returns the ComponentIndex of the current layout
+        (cached until the layout changes)
+        """
+        cache = self.component_cache
+        if cache is None or cache.key != self.layout_version:
+            cache = self.component_cache = ComponentIndex(self.objects, self.layout_version)
+        return cache
+
+    def engine_slots(self):
+        """
+        Returns the engine index of every object in objects
+        (-1 for objects the engine doesn't step)
+        """
+        self.slots()
+        return self.slot_cache[4]
+
+    def activity(self):
+        """
+        Returns the Activity of the current layout and
+        sleeping set (cached until either changes)
+        """
+        key = (self.layout_version, self.activity_version)
+        if self.activity_cache is None or self.activity_cache.key != key:
+            self.activity_cache = Activity(self, key)
+        return self.activity_cache
+
+    def mark_asleep(self, slots, asleep=True):
+        """
+        Puts the objects at the given positions in objects
+        to sleep (or wakes them, if asleep is False)
+        """
+        self.asleep[slots] = asleep
+        self.rest_frames[slots] = 0
+        objects = [self.objects[i] for i in slots.tolist()]
+        for object in objects:
+            object.asleep = asleep
+        self.trajectories.invalidate(objects)
+        self.activity_version += 1
+
+    def wake(self, *objects):
+        """
+        Wakes the given objects if they are asleep, along
+        with the rest of their islands
+        """
+        sleepers = [object for object in objects if object.asleep]
+        if sleepers:
+            act = self.activity()
+            self.wake_islands(act, act.islands[[act.sleep_position[id(object)]
+                                                for object in sleepers]])
+
+    def wake_islands(self, act, labels):
+        """
+        Wakes every sleeper of an Activity whose island has
+        one of the given labels, keeping the collisions
+        between them for the next resolve_collisions()
+        """
+        woken = np.in1d(act.islands, labels)
+        self.mark_asleep(act.sleep_slots[woken], False)
+        first, second, toi, along_x, normal = act.sleep_pairs
+        keep = woken[first]
+        sleeping = act.sleeping
+        for i, j, t, a_x, n in zip(first[keep].tolist(), second[keep].tolist(), toi[keep].tolist(),
+                                   along_x[keep].tolist(), normal[keep].tolist()):
+            self.wake_events.append(CollisionEvent(sleeping[i], sleeping[j], t, a_x, n))
+
+    def wake_all(self):
+        """
+        Wakes every sleeping object
+        """
+        act = self.activity()
+        if act.sleeping:
+            self.wake_islands(act, act.islands)
+
+    def set_bounds(self, floor=None, ceiling=None, left_wall=None, right_wall=None):
+        """
+        Moves the given stage boundaries, redrawing the
+        backdrop and waking every sleeping object (which may
+        no longer be at rest)
+        """
+        if floor is not None:
+            self.floor = floor
+        if ceiling is not None:
+            self.ceiling = ceiling
+        if left_wall is not None:
+            self.left_wall = left_wall
+        if right_wall is not None:
+            self.right_wall = right_wall
+        self.camera.set_world(*self.world_size())
+        self.backdrop = self.build_backdrop()
+        self.renderer.reset()
+        self.wake_all()
+
+    def set_level(self, level):
+        """
+        Sets the stage's level geometry (a level.TileMap, or
+        None for none), redrawing the backdrop and waking
+        every sleeping object
+        """
+        self.level = level
+        self.camera.set_world(*self.world_size())
+        self.backdrop = self.build_backdrop()
+        self.renderer.reset()
+        self.wake_all()
+
+    def world_size(self):
+        """
+        Returns the width & height of the stage's world: the
+        boundaries plus, past the floor & right wall, the
+        same margin as before the ceiling & left wall, grown
+        to cover the level if there is one
+        """
+        width = self.right_wall + self.left_wall
+        height = self.floor + self.ceiling
+        if self.level is not None:
+            width = max(width, self.level.width)
+            height = max(height, self.level.height)
+        return width, height
+
+    def scroll_to(self, x, y):
+        """
+        Moves the camera's view so its top left corner is
+        at (x, y) in the world (or as close as the world's
+        edges allow), redrawing the backdrop if it moved
+        """
+        if self.camera.move_to(x, y):
+            self.backdrop = self.build_backdrop()
+
+    def follow(self, object):
+        """
+        Scrolls the camera's view to center on an object
+        """
+        x, y = object.draw_rect.center
+        self.scroll_to(x - self.camera.width // 2, y - self.camera.height // 2)
+
     def update(self):
         """
         Update stage state. Responsible for updating
         some state properties of object members (which
         ones and to what extent may change in later 
-        versions)
+        versions). Sleeping objects are skipped
         """
+        if self.history is not None:
+            self.history.save(self)
+
         if self.objects:
-            # DEBUG: Resolve any collisions from last update?
+            profiler = self.profiler
+
+            # Remember where objects were drawn before this
+            #   update, for interpolated drawing
+            self.save_positions()
+            profiler.lap("save_positions")
+
+            # Resolve any collisions from last update
+            self.resolve_collisions()
+            profiler.lap("resolve_collisions")
 
             # Apply gravity to all gravity-subject game
             #   objects in stage
             self.apply_gravity()
+            profiler.lap("apply_gravity")
 
-            # Update game object states
-            for object in self.objects:
-                # Pass any input events along to stage objects
-                if not self.input_queue.empty():
-                    event = self.input_queue.get()
-                    object.input_queue.put(InputEvent(event.type, event.key))
-                # Update object states
-                object.update()
-                
-                # DEBUG: Look for max deltas for cardinal directions
-                if object.deltaX < 0 and self.max_ever_dx_left > object.deltaX:
-                    self.max_ever_dx_left = object.deltaX
-                    print "New max dx left of  : " + str(self.max_ever_dx_left)
-                if object.deltaX > 0 and self.max_ever_dx_right < object.deltaX:
-                    self.max_ever_dx_right = object.deltaX
-                    print "New max dx right of : " + str(self.max_ever_dx_right)
-                if object.deltaY > 0 and self.max_ever_dy_down < object.deltaY:
-                    self.max_ever_dy_down = object.deltaY
-                    print "New max dy down of  : " + str(self.max_ever_dy_down)
-                if object.deltaY < 0 and self.max_ever_dy_up > object.deltaY:
-                    self.max_ever_dy_up = object.deltaY
-                    print "New max dy up of    : " + str(self.max_ever_dy_up)
-            
-    def draw(self, screen):
+            # Deliver this frame's input events to the
+            #   objects subscribed to them
+            self.input_bus.dispatch(self.frame)
+            profiler.lap("input")
+
+            # Update game object states, then roll grounded
+            #   objects with the friction component to a halt
+            if self.engine is not None:
+                self.update_vectorized()
+            else:
+                self.update_objects()
+            self.apply_friction()
+            profiler.lap("update_objects")
+
+            # Queue up collisions between objects for
+            #   resolution next update
+            self.detect_collisions()
+            profiler.lap("detect_collisions")
+
+            # Put objects that have come to rest to sleep
+            self.settle()
+            profiler.lap("settle")
+
+            # Record this frame's stats
+            self.record_metrics()
+            profiler.lap("metrics")
+
+        self.frame += 1
+
+    def save_positions(self):
         """
-        Wipes previous frame's contents with 
-        background and draws game surface members
+        Records every awake object's current drawing position
+        as its previous one (sleepers haven't moved)
         """
-        # Blit background 
-        screen.blit(self.background,[0,0])
-        
-        # Draw primitive lines to delineate ceiling,
-        #   floor, and walls
-        pyg.draw.line(screen, con.GREEN, (0, self.floor), (con.SCREEN_WIDTH, self.floor))
-        pyg.draw.line(screen, con.GREEN, (0, self.ceiling), (con.SCREEN_WIDTH, self.ceiling))
-        pyg.draw.line(screen, con.GREEN, (self.left_wall, 0), (self.left_wall, con.SCREEN_HEIGHT))
-        pyg.draw.line(screen, con.GREEN, (self.right_wall, 0), (self.right_wall, con.SCREEN_HEIGHT))
-
-        # Draw game objects (if there are any)
-        if self.objects:
-            for object in self.objects:
-                object.draw(screen)
+        act = self.activity()
+        engine = self.engine
+        if engine is not None:
+            if act.step_index is None:
+                n = engine.count
+                engine.px[:n] = engine.rx[:n]
+                engine.py[:n] = engine.ry[:n]
+            else:
+                index = act.awake_index
+                engine.px[index] = engine.rx[index]
+                engine.py[index] = engine.ry[index]
+        for object in act.awake_unbound:
+            object.prev_topleft = object.draw_rect.topleft
 
-    def apply_gravity(self):
+    def offset_arrays(self, alpha, slots=None):
+        """
+        Returns, for every object in order (or those at the
+        given positions in objects), how far to shift its
+        drawing rect back toward its previous position so it
+        is drawn alpha of the way between its last two
+        updates (as x & y integer arrays)
+        """
+        if slots is None:
+            slots = np.arange(len(self.objects))
+        n = len(slots)
+        offset_x = np.zeros(n, dtype=int)
+        offset_y = np.zeros(n, dtype=int)
+        if alpha >= 1:
+            return offset_x, offset_y
+        back = 1.0 - alpha
+        engine_slot = self.engine_slots()[slots]
+        bound = np.flatnonzero(engine_slot >= 0)
+        if len(bound):
+            engine = self.engine
+            index = engine_slot[bound]
+            offset_x[bound] = np.round((engine.px[index] - engine.rx[index]) * back)
+            offset_y[bound] = np.round((engine.py[index] - engine.ry[index]) * back)
+        for k in np.flatnonzero(engine_slot < 0).tolist():
+            object = self.objects[slots[k]]
+            if object.prev_topleft is not None:
+                x, y = object.draw_rect.topleft
+                offset_x[k] = int(round((object.prev_topleft[0] - x) * back))
+                offset_y[k] = int(round((object.prev_topleft[1] - y) * back))
+        return offset_x, offset_y
+
+    def draw_states(self, offset_x, offset_y, slots=None):
+        """
+        Returns an (n, 10) array describing what each object
+        (or each of those at the given positions in objects)
+        draws when shifted by the given offsets: the left,
+        top, right and bottom of the screen area it covers
+        (see draw_area()), then the top left corners of its
+        drawing rect, pushbox and (DEBUG) predicted impact
+        rect. An object whose row is unchanged draws exactly
+        the same pixels
+        """
+        if slots is None:
+            slots = np.arange(len(self.objects))
+        states = np.zeros((len(slots), 10), dtype=int)
+        engine_slot = self.engine_slots()[slots]
+        bound = np.flatnonzero(engine_slot >= 0)
+        if len(bound):
+            engine = self.engine
+            index = engine_slot[bound]
+            x = engine.x[index]
+            y = engine.y[index]
+            right = x + engine.w[index]
+            bottom = y + engine.h[index]
+            rx = engine.rx[index]
+            ry = engine.ry[index]
+            area = states[bound, :4]
+            area[:, 0] = np.minimum(x, rx)
+            area[:, 1] = np.minimum(y, ry)
+            area[:, 2] = np.maximum(right, rx + engine.rw[index])
+            area[:, 3] = np.maximum(bottom, ry + engine.rh[index])
+            states[bound, 4] = rx
+            states[bound, 5] = ry
+            states[bound, 6] = x
+            states[bound, 7] = y
+
+            # DEBUG: Prediction rects lie along the pushbox's
+            #   next move (see Ball.clsn_predict()), so the
+            #   area covers the box it sweeps
+            if con.DEBUG:
+                dx = engine.dx[index]
+                dy = engine.dy[index]
+                end_x = np.trunc(x + dx)
+                end_y = np.trunc(y + dy)
+                area[:, 0] = np.minimum(area[:, 0], end_x)
+                area[:, 1] = np.minimum(area[:, 1], end_y)
+                area[:, 2] = np.maximum(area[:, 2], end_x + right - x)
+                area[:, 3] = np.maximum(area[:, 3], end_y + bottom - y)
+                toi = engine.toi[index]
+                with np.errstate(invalid="ignore"):
+                    states[bound, 8] = np.where(toi > 1, end_x, np.trunc(x + toi*dx))
+                    states[bound, 9] = np.where(toi > 1, end_y, np.trunc(y + toi*dy))
+            states[bound, :4] = area
+        for k in np.flatnonzero(engine_slot < 0).tolist():
+            object = self.objects[slots[k]]
+            area = object.draw_area()
+            states[k, :8] = (area.left, area.top, area.right, area.bottom) + \
+                object.draw_rect.topleft + object.pushbox.topleft
+            if con.DEBUG and isinstance(object, Ball) and object.predict_rects:
+                states[k, 8:] = object.predict_rects[0].topleft
+        states[:, 0::2] += offset_x[:, None]
+        states[:, 1::2] += offset_y[:, None]
+        return states
+
+    def view(self, left, top, right, bottom, alpha=1.0):
         """
-        Applies stage gravity to all gravity-subject game 
-        objects within the stage
+        Returns the positions in objects (in order) of the
+        objects that draw inside the given world area when
+        drawn alpha of the way between their last two
+        updates, with their offsets & draw states (see
+        offset_arrays() & draw_states()). Sleepers are looked
+        up in a grid of their draw areas built once per
+        Activity, so only awake objects are tested one by one
         """
+        act = self.activity()
+
+        # Awake objects
+        slots = act.awake_slots
+        offset_x, offset_y = self.offset_arrays(alpha, slots)
+        states = self.draw_states(offset_x, offset_y, slots)
+        inside = ((states[:, 0] < right) & (states[:, 2] > left) &
+                  (states[:, 1] < bottom) & (states[:, 3] > top))
+        parts = [(slots[inside], offset_x[inside], offset_y[inside], states[inside])]
+
+        # Sleepers (which stay put, so need no offsets)
+        if len(act.sleep_slots):
+            if act.view_grid is None:
+                none = np.zeros(len(act.sleep_slots), dtype=int)
+                act.view_states = areas = self.draw_states(none, none, act.sleep_slots)
+                act.view_grid = SpatialHash(VIEW_CELL_SIZE)
+                act.view_grid.rebuild(areas[:, 0], areas[:, 1], areas[:, 2] - areas[:, 0],
+                                      areas[:, 3] - areas[:, 1])
+            near = act.view_grid.cross_pairs(np.array([left]), np.array([top]),
+                                             np.array([right - left]), np.array([bottom - top]))[1]
+            states = act.view_states[near]
+            inside = ((states[:, 0] < right) & (states[:, 2] > left) &
+                      (states[:, 1] < bottom) & (states[:, 3] > top))
+            none = np.zeros(np.count_nonzero(inside), dtype=int)
+            parts.append((act.sleep_slots[near[inside]], none, none, states[inside]))
+
+        slots, offset_x, offset_y, states = [np.concatenate(part) for part in zip(*parts)]
+        order = np.argsort(slots, kind="mergesort")
+        return slots[order], offset_x[order], offset_y[order], states[order]
+
+    def update_objects(self):
+        """
+        Updates awake object states one object at a time
+        """
+        self.bounces = 0
+        for object in self.activity().awake:
+            # Update object states
+            object.update()
+
+    def update_vectorized(self):
+        """
+        Updates awake object states with the physics engine
+        stepping every registered Ball at once. Matches
+        update_objects() frame for frame
+        """
+        act = self.activity()
+
+        # Move and collide all awake registered Balls
+        self.bounces = self.engine.step(act.step_index)
+
+        # Update whatever the engine doesn't manage
+        for object in act.awake_unbound:
+            object.update()
+
+    def record_metrics(self):
+        """
+        Hands every object's deltas, the number of sleeping
+        objects and this update's bounce count to the
+        metrics aggregator
+        """
+        act = self.activity()
+        engine = self.engine
+        if engine is not None and engine.count == len(self.objects):
+            n = engine.count
+            dx, dy = engine.dx[:n], engine.dy[:n]
+        else:
+            # (Sleepers' deltas are those they fell asleep with)
+            dx = np.array([object.deltaX for object in act.awake], dtype=float)
+            dy = np.array([object.deltaY for object in act.awake], dtype=float)
+            dx = np.concatenate((dx, act.sleep_bodies[4]))
+            dy = np.concatenate((dy, act.sleep_bodies[5]))
+        self.metrics.record(self.frame, dx, dy, self.bounces, len(act.sleeping))
+
+    def body_arrays(self, objects, index=None):
+        """
+        Returns arrays of the given objects' pushbox left,
+        top, width and height, their deltas, and whether
+        gravity affects them (gathered from the physics
+        engine at index if given)
+        """
+        engine = self.engine
+        if index is not None:
+            return (engine.x[index], engine.y[index], engine.w[index], engine.h[index],
+                    engine.dx[index], engine.dy[index], engine.is_gravity[index])
+        states = np.array([tuple(object.pushbox) + (object.deltaX, object.deltaY,
+                                                   GRAVITY in object.components and object.is_gravity)
+                           for object in objects], dtype=np.float64).reshape(-1, 7)
+        return (states[:, 0], states[:, 1], states[:, 2], states[:, 3],
+                states[:, 4], states[:, 5], states[:, 6] != 0)
+
+    def motion(self, x, y, w, h, dx, dy, is_gravity):
+        """
+        Returns body arrays (see body_arrays()) as pushbox
+        left, top, width, height and next update's deltas,
+        gravity included
+        """
+        return x, y, w, h, dx, np.where(is_gravity & (dy != 0), dy + self.gravity, dy)
+
+    def narrow_phase(self, first, second, x, y, w, h, dx, dy):
+        """
+        Returns the broad phase pairs whose pushboxes touch
+        now, or would pass clean through each other while
+        moving by their deltas, along with their time of
+        impact (0 if touching) and axis & normal of impact
+        (see sweep())
+        """
+        toi, along_x, normal, tunnel = sweep(first, second, x, y, w, h, dx, dy)
+        contact = touching(first, second, x, y, w, h)
+        toi[contact] = 0
+        keep = contact | (tunnel & (toi > 0))
+        return first[keep], second[keep], toi[keep], along_x[keep], normal[keep]
+
+    def detect_collisions(self):
+        """
+        Runs the broad phase over the area every awake
+        object's pushbox sweeps through during the next
+        update, and queues a CollisionEvent with both
+        objects of each pair that touches now, or that would
+        pass clean through each other during that update
+        (with its time of impact, so fast objects can't
+        tunnel). Pairs that merely end the update
+        overlapping are left to be found then. Sleeping
+        objects caught up in a collision are woken first
+        """
+        act = self.activity()
+        motion = self.motion(*self.body_arrays(act.awake, act.awake_index if act.bound else None))
+        if act.sleeping and self.wake_touched(act, *motion):
+            act = self.activity()
+            motion = self.motion(*self.body_arrays(act.awake,
+                                                   act.awake_index if act.bound else None))
+        objects = act.awake
+        x, y, w, h, dx, dy = motion
+        self.wake_events = []
+
+        first, second = self.broad_phase.swept_pairs(x, y, w, h, dx, dy)
+        first, second, toi, along_x, normal = self.narrow_phase(first, second, x, y, w, h, dx, dy)
+        self.awake_pairs = (act.key, first, second)
+
+        # DEBUG: Earliest time of impact for every object
+        #   (stage boundaries included), only used to draw
+        #   prediction rects
+        if con.DEBUG:
+            earliest = np.empty(len(objects))
+            bounds = (self.left_wall, self.ceiling, self.right_wall, self.floor)
+            boundary_toi(x, y, w, h, dx, dy, bounds, earliest)
+            predicted = toi > 0
+            np.minimum.at(earliest, first[predicted], toi[predicted])
+            np.minimum.at(earliest, second[predicted], toi[predicted])
+            if act.bound:
+                self.engine.toi[act.awake_index] = earliest
+            for object, object_toi in zip(objects, earliest.tolist()):
+                if isinstance(object, Ball):
+                    object.clsn_predict(object_toi)
+
+        for i, j, t, a_x, n in zip(first.tolist(), second.tolist(), toi.tolist(),
+                                   along_x.tolist(), normal.tolist()):
+            self.queue_collision(CollisionEvent(objects[i], objects[j], t, a_x, n))
+
+    def wake_touched(self, act, x, y, w, h, dx, dy):
+        """
+        Wakes the islands of the sleepers that any awake
+        object (given its motion, see motion()) touches or
+        would meet during the next update. Returns whether
+        any woke
+        """
+        near, sleeper = self.sleep_grid.cross_pairs(
+            np.minimum(x, x + dx), np.minimum(y, y + dy),
+            w + np.ceil(np.abs(dx)), h + np.ceil(np.abs(dy)), 1)
+        if not len(near):
+            return False
+
+        # Narrow phase over the awake objects followed by
+        #   the sleepers they may collide with
+        partners, sleeper = np.unique(sleeper, return_inverse=True)
+        n = len(x)
+        bodies = self.motion(*[array[partners] for array in act.sleep_bodies])
+        arrays = [np.concatenate(pair) for pair in zip((x, y, w, h, dx, dy), bodies)]
+        second = self.narrow_phase(near, n + sleeper, *arrays)[1]
+        if not len(second):
+            return False
+        self.wake_islands(act, act.islands[partners[second - n]])
+        return True
+
+    def settle(self):
+        """
+        Counts how many updates in a row each awake object's
+        state has stayed unchanged, and puts those unchanged
+        for SLEEP_FRAMES updates to sleep, but only along
+        with every awake object they collide with (directly
+        or through others): a group of objects that stays
+        unchanged as a whole would stay that way until
+        disturbed, so sleeping through it changes nothing
+        """
+        act = self.activity()
+        slots = act.awake_slots
+        if not len(slots):
+            return
+        state = self.rest_state(act)
+        unchanged = (state == self.last_state[slots]).all(axis=1)
+        self.last_state[slots] = state
+        rest_frames = np.where(unchanged, self.rest_frames[slots] + 1, 0)
+        self.rest_frames[slots] = rest_frames
+        ready = rest_frames >= SLEEP_FRAMES
+        if not ready.any():
+            return
+
+        # Drop islands of colliding awake objects that aren't
+        #   all ready
+        key, first, second = self.awake_pairs
+        if key != act.key:
+            return
+
+        # Grounded objects with nothing under them fall next
+        #   update (see release_perched()), so aren't ready
+        x, y, w, h = self.body_arrays(act.awake, act.awake_index if act.bound else None)[:4]
+        along_x, normal, touching = self.solver.contacts(first, second, x, y, w, h)[1:]
+        grounded = self.level.resting(x, y, w, h) if self.level is not None else None
+        supported = self.solver.supported(first, second, along_x, normal, touching, y, h,
+                                          self.floor, grounded)
+        ready &= supported | (state[:, 6] != 0)
+        labels = islands(len(slots), first, second)
+        restless = np.bincount(labels, weights=~ready, minlength=len(slots)) > 0
+        ready &= ~restless[labels]
+        if ready.any():
+            self.mark_asleep(slots[ready])
+
+    def rest_state(self, act):
+        """
+        Returns an (n, REST_STATE_SIZE) array of the state
+        of an Activity's awake objects: pushbox & drawing
+        rect positions, deltas and bounce flag
+        """
+        if act.bound:
+            engine = self.engine
+            i = act.awake_index
+            return np.column_stack((engine.x[i], engine.y[i], engine.rx[i], engine.ry[i],
+                                    engine.dx[i], engine.dy[i], engine.can_bounce[i]))
+        return np.array([object.pushbox.topleft + object.draw_rect.topleft +
+                         (object.deltaX, object.deltaY, getattr(object, "can_bounce", True))
+                         for object in act.awake], dtype=np.float64).reshape(-1, REST_STATE_SIZE)
+
+    def queued_events(self):
+        """
+        Returns the CollisionEvents queued for the next
+        update, in the order drain_collisions() would
+        return them, without draining them
+        """
+        events = []
+        seen = set()
+        for object in self.clsn_pending:
+            for event in object.clsn_queue or ():
+                if id(event) not in seen:
+                    seen.add(id(event))
+                    events.append(event)
+        return events
+
+    def queue_collision(self, event):
+        """
+        Queues a CollisionEvent with both of its objects
+        for resolution next update
+        """
+        event.first.queue_collision(event)
+        event.second.queue_collision(event)
+        self.clsn_pending.append(event.first)
+        self.clsn_pending.append(event.second)
+
+    def drain_collisions(self):
+        """
+        Empties the collision queues filled last update and
+        returns the CollisionEvents they held (and those of
+        objects woken since), each one once
+        """
+        events = []
+        seen = set()
+        for object in self.clsn_pending:
+            for event in object.drain_collisions():
+                if id(event) not in seen:
+                    seen.add(id(event))
+                    events.append(event)
+        self.clsn_pending = []
+        events += self.wake_events
+        self.wake_events = []
+        return events
+
+    def resolve_collisions(self):
+        """
+        Drains the CollisionEvents queued last update and
+        resolves all of them in one batch with the impulse
+        solver
+        """
+        events = self.drain_collisions()
+
+        # Number every object taking part in a collision
+        bodies = []
+        index = {}
+        first = []
+        second = []
+        for event in events:
+            for object, side in ((event.first, first), (event.second, second)):
+                key = id(object)
+                if key not in index:
+                    index[key] = len(bodies)
+                    bodies.append(object)
+                side.append(index[key])
+        first = np.array(first, dtype=np.intp)
+        second = np.array(second, dtype=np.intp)
+        impact = (np.array([event.toi for event in events], dtype=np.float64),
+                  np.array([event.along_x for event in events], dtype=np.bool_),
+                  np.array([event.normal for event in events], dtype=np.float64))
+        bounds = (self.left_wall, self.ceiling, self.right_wall, self.floor)
+
+        # Work on copies of the engine arrays if it holds
+        #   every body; otherwise read the objects directly
+        engine = self.engine
+        if engine is not None and all(object.engine is engine for object in bodies):
+            slots = np.array([object.engine_index for object in bodies], dtype=np.intp)
+            x, y, w, h = engine.x[slots], engine.y[slots], engine.w[slots], engine.h[slots]
+            dx, dy = engine.dx[slots], engine.dy[slots]
+            can_bounce = engine.can_bounce[slots]
+            shift_x, shift_y, supported = self.solver.solve(
+                first, second, x, y, w, h, dx, dy, engine.proration[slots], can_bounce, bounds,
+                impact, self.level)
+
+            # Collisions that changed a body drop its
+            #   predicted trajectory
+            changed = ((x != engine.x[slots]) | (y != engine.y[slots]) | (shift_x != 0) |
+                       (shift_y != 0) | (dx != engine.dx[slots]) | (dy != engine.dy[slots]) |
+                       (can_bounce != engine.can_bounce[slots]))
+            self.trajectories.invalidate([bodies[k] for k in np.flatnonzero(changed).tolist()])
+            engine.x[slots] = x
+            engine.y[slots] = y
+            engine.rx[slots] += shift_x
+            engine.ry[slots] += shift_y
+            engine.dx[slots] = dx
+            engine.dy[slots] = dy
+            engine.can_bounce[slots] = can_bounce
+            self.release_perched(slots[supported], True)
+            return
+
+        boxes = np.array([tuple(object.pushbox) for object in bodies], dtype=np.float64).reshape(-1, 4)
+        x, y, w, h = [boxes[:, k].copy() for k in range(4)]
+        old_dx = np.array([object.deltaX for object in bodies], dtype=np.float64)
+        old_dy = np.array([object.deltaY for object in bodies], dtype=np.float64)
+        old_can_bounce = np.array([getattr(object, "can_bounce", True) for object in bodies], dtype=np.bool_)
+        proration = np.array([getattr(object, "proration", 0) for object in bodies], dtype=np.float64)
+        dx, dy, can_bounce = old_dx.copy(), old_dy.copy(), old_can_bounce.copy()
+        shift_x, shift_y, supported = self.solver.solve(
+            first, second, x, y, w, h, dx, dy, proration, can_bounce, bounds, impact, self.level)
+
+        # Write back only what changed (dropping the predicted
+        #   trajectories of the objects that did)
+        changed = ((shift_x != 0) | (shift_y != 0) | (dx != old_dx) | (dy != old_dy) |
+                   (can_bounce != old_can_bounce))
+        self.trajectories.invalidate([bodies[k] for k in np.flatnonzero(changed).tolist()])
+        for k, object in enumerate(bodies):
+            if shift_x[k] or shift_y[k]:
+                pushbox = object.pushbox
+                draw_rect = object.draw_rect
+                pushbox.x += int(shift_x[k])
+                pushbox.y += int(shift_y[k])
+                draw_rect.x += int(shift_x[k])
+                draw_rect.y += int(shift_y[k])
+                object.pushbox = pushbox
+                object.draw_rect = draw_rect
+            if dx[k] != old_dx[k]:
+                object.deltaX = float(dx[k])
+            if dy[k] != old_dy[k]:
+                object.deltaY = float(dy[k])
+            if can_bounce[k] != old_can_bounce[k]:
+                object.can_bounce = bool(can_bounce[k])
+        self.release_perched([bodies[k] for k in np.flatnonzero(supported)])
+
+    def release_perched(self, supported, engine_slots=False):
+        """
+        Lets awake objects grounded on top of other objects
+        fall again once nothing (object or solid tile)
+        supports them (supported
+        holds objects, or engine slots if engine_slots is
+        set, in which case only objects the engine steps
+        are checked)
+        """
+        act = self.activity()
+        if engine_slots:
+            engine = self.engine
+            index = act.awake_index
+            perched = ~engine.can_bounce[index] & (engine.y[index] + engine.h[index] < self.floor)
+            if self.level is not None:
+                perched &= ~self.level.resting(engine.x[index], engine.y[index],
+                                               engine.w[index], engine.h[index])
+            index = index[perched & ~np.in1d(index, supported)]
+            # Start falling the way a Ball spawned in midair does
+            engine.dy[index] = 0.01
+            engine.can_bounce[index] = True
+            self.trajectories.invalidate([engine.bodies[i] for i in index.tolist()])
+            return
+        supported = set(id(object) for object in supported)
+        for object in act.awake:
+            if (not getattr(object, "can_bounce", True) and object.pushbox.bottom < self.floor
+                    and id(object) not in supported and not self.on_tiles(object)):
+                object.deltaY = 0.01
+                object.can_bounce = True
+                self.trajectories.invalidate((object,))
+
+    def on_tiles(self, object):
+        """
+        Returns whether an object rests on solid tiles of the
+        stage's level
+        """
+        if self.level is None:
+            return False
+        return bool(self.level.resting(*object.pushbox))
+
+    def save_state(self):
+        """
+        Returns a compact binary snapshot of the stage's
+        full state (see snapshot.py): update counters,
+        gravity & boundaries, every object's physical and
+        activity state, and the collisions queued for the
+        next update
+        """
+        objects = self.objects
+        n = len(objects)
+        records = np.zeros(n, dtype=OBJECT_DTYPE)
+        fields = PhysicsEngine.FLOAT_FIELDS + PhysicsEngine.BOOL_FIELDS
+        bound, index, unbound = self.slots()
+        if len(bound):
+            engine = self.engine
+            for name in fields:
+                records[name][bound] = getattr(engine, name)[index]
+        if unbound:
+            states = np.array([tuple(object.pushbox) + tuple(object.draw_rect) +
+                               tuple(object.prev_topleft or object.draw_rect.topleft) +
+                               (object.deltaX, object.deltaY, getattr(object, "friction", 0),
+                                getattr(object, "proration", 0), np.inf,
+                                getattr(object, "can_bounce", True),
+                                GRAVITY in object.components and object.is_gravity)
+                               for object in (objects[i] for i in unbound)], dtype=np.float64)
+            for k, name in enumerate(fields):
+                records[name][unbound] = states[:, k]
+        records["asleep"] = self.asleep[:n]
+        records["rest_frames"] = self.rest_frames[:n]
+        records["last_state"] = self.last_state[:n]
+
+        # Queued collisions, by object position (skipping any
+        #   with an object no longer on the stage)
+        position = dict((id(object), i) for i, object in enumerate(objects))
+        queued = [(event, False) for event in self.queued_events()]
+        queued += [(event, True) for event in self.wake_events]
+        events = np.array([(position[id(event.first)], position[id(event.second)], event.toi,
+                            event.along_x, event.normal, woken) for event, woken in queued
+                           if id(event.first) in position and id(event.second) in position],
+                          dtype=EVENT_DTYPE)
+        bounds = (self.floor, self.ceiling, self.left_wall, self.right_wall)
+        return pack(self.frame, self.bounces, self.gravity, bounds, records, events)
+
+    def restore_state(self, data):
+        """
+        Restores the stage to a snapshot from save_state().
+        The stage must hold the same objects (in the same
+        order) as when the snapshot was taken
+        """
+        frame, bounces, gravity, bounds, records, events = unpack(data)
+        objects = self.objects
+        n = len(objects)
+        if len(records) != n:
+            raise ValueError("snapshot holds %d objects, stage has %d" % (len(records), n))
+        if bounds != (self.floor, self.ceiling, self.left_wall, self.right_wall):
+            self.set_bounds(*bounds)
+        self.frame = frame
+        self.bounces = bounces
+        self.gravity = gravity
+
+        fields = PhysicsEngine.FLOAT_FIELDS + PhysicsEngine.BOOL_FIELDS
+        bound, index, unbound = self.slots()
+        if len(bound):
+            engine = self.engine
+            for name in fields:
+                getattr(engine, name)[index] = records[name][bound]
+        for i, record in zip(unbound, records[unbound].tolist()):
+            object = objects[i]
+            x, y, w, h, rx, ry, rw, rh, px, py, dx, dy, friction, proration = record[:14]
+            can_bounce, is_gravity = record[15:17]
+            object.pushbox = pyg.Rect(int(x), int(y), int(w), int(h))
+            object.draw_rect = pyg.Rect(int(rx), int(ry), int(rw), int(rh))
+            object.prev_topleft = (int(px), int(py))
+            object.deltaX = dx
+            object.deltaY = dy
+            components = object.components
+            if FRICTION in components:
+                object.friction = friction
+            if BOUNCE in components:
+                object.proration = proration
+                object.can_bounce = can_bounce
+            if GRAVITY in components:
+                object.is_gravity = is_gravity
+
+        # Activity (the cached Activity is rebuilt on next use)
+        self.asleep[:n] = records["asleep"]
+        self.rest_frames[:n] = records["rest_frames"]
+        self.last_state[:n] = records["last_state"]
+        for object, asleep in zip(objects, records["asleep"].tolist()):
+            object.asleep = asleep
+        self.activity_version += 1
+        self.awake_pairs = (None, None, None)
+        self.trajectories.clear()
+
+        # Queued collisions
+        self.drain_collisions()
+        for i, j, t, a_x, normal, woken in events.tolist():
+            event = CollisionEvent(objects[i], objects[j], t, a_x, normal)
+            if woken:
+                self.wake_events.append(event)
+            else:
+                self.queue_collision(event)
+
+        # Input logs are replayed from the restored frame on
+        if self.input_bus.replayer is not None:
+            self.input_bus.replayer.seek(frame)
+
+    def object_states(self):
+        """
+        Returns the state of every stage object as a dict of
+        pushbox position, deltas and (for Balls) bounce flag
+        """
+        states = []
         for object in self.objects:
-            if isinstance(object, GravityObject) and object.is_gravity:
+            pushbox = object.pushbox
+            states.append({
+                "x"          : pushbox.x,
+                "y"          : pushbox.y,
+                "deltaX"     : object.deltaX,
+                "deltaY"     : object.deltaY,
+                "can_bounce" : getattr(object, "can_bounce", None)
+            })
+        return states
+
+    def predict(self, objects, frames=trajectory.PREDICT_FRAMES):
+        """
+        Returns a trajectory.Trajectory of the given Balls
+        (rows in the given order) over the next frames
+        updates: their paths, bounces and where they come to
+        rest. Collisions with other objects aren't
+        predicted; a ball's prediction is cached until
+        apply_force(), a collision, falling asleep or waking
+        drops it (as does any change of gravity, boundaries
+        or level), so asking again on later updates costs a
+        lookup
+        """
+        cache = self.trajectories
+        cache.check((self.gravity, self.floor, self.ceiling, self.left_wall, self.right_wall,
+                     self.level))
+        missing = cache.missing(objects, self.frame, frames)
+        if missing:
+            engine = self.engine
+            if engine is not None and all(object.engine is engine for object in missing):
+                bodies = engine.gather(np.array([object.engine_index for object in missing],
+                                                dtype=np.intp))
+            else:
+                bodies = trajectory.gather(missing)
+
+            # Sleepers stay put until something wakes them
+            #   (which drops their prediction)
+            asleep = np.array([object.asleep for object in missing], dtype=np.bool_)
+            bodies.dx[:bodies.count][asleep] = 0
+            bodies.dy[:bodies.count][asleep] = 0
+
+            # Predict twice as far as asked, so asking again
+            #   over the next updates is served from the cache
+            predicted = trajectory.predict(bodies, 2 * frames, self.gravity, self.floor,
+                                           self.ceiling, self.left_wall, self.right_wall,
+                                           self.level)
+            cache.store(missing, self.frame, predicted)
+        return cache.get(objects, self.frame, frames)
+
+    def build_backdrop(self):
+        """
+        Returns the background of the camera's view with
+        primitive lines drawn on it to delineate ceiling,
+        floor, and walls (and the outlines of the level's
+        solid tiles)
+        """
+        camera = self.camera
+        x, y = camera.x, camera.y
+        width, height = camera.world_width, camera.world_height
+        backdrop = pyg.Surface(self.background.get_size())
+        backdrop.blit(self.background, [0, 0])
+        pyg.draw.line(backdrop, con.GREEN, (-x, self.floor - y), (width - x, self.floor - y))
+        pyg.draw.line(backdrop, con.GREEN, (-x, self.ceiling - y), (width - x, self.ceiling - y))
+        pyg.draw.line(backdrop, con.GREEN, (self.left_wall - x, -y), (self.left_wall - x, height - y))
+        pyg.draw.line(backdrop, con.GREEN, (self.right_wall - x, -y), (self.right_wall - x, height - y))
+        if self.level is not None:
+            size = self.level.tile_size
+            rows, cols = self.level.solid_tiles(x, y, x + camera.width, y + camera.height)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                pyg.draw.rect(backdrop, con.GREEN, (col * size - x, row * size - y, size, size), 1)
+        return backdrop
+
+    def draw(self, screen, alpha=1.0):
+        """
+        Draws the game surface members the camera sees over
+        the backdrop, interpolated alpha of the way from their
+        previous positions to their current ones. Only
+        regions that changed since the last frame are
+        redrawn (everything is while scrolling); returns
+        their rects, or None if the whole screen was redrawn
+        """
+        return self.renderer.draw(screen, self, alpha)
+
+    def apply_gravity(self):
+        """
+        Applies stage gravity to all awake game objects
+        with the gravity component
+        """
+        act = self.activity()
+        if self.engine is not None:
+            self.engine.apply_gravity(self.gravity, act.bound_members[GRAVITY])
+        for object in act.unbound_members[GRAVITY]:
+            if object.is_gravity:
                 if not object.deltaY == 0:
                     object.deltaY += self.gravity
+
+    def apply_friction(self):
+        """
+        Applies friction to all awake grounded game objects
+        with the friction component (bounceable objects are
+        still in the air)
+        """
+        act = self.activity()
+        if self.engine is not None:
+            self.engine.apply_friction(act.bound_members[FRICTION])
+        for object in act.unbound_members[FRICTION]:
+            if not getattr(object, "can_bounce", True):
+                object.apply_friction()
@@ -0,0 +1,196 @@
+"""
+Parameter sweep runner for stage gravity and Ball
+friction & proration. Simulates every configuration of a
+grid (or a random sample) of parameter values headlessly
+under SDL's dummy video driver, one configuration per
+worker process, and collects a summary of each run (time
+to rest, floor bounces, largest deltas) into one table
+
+Run python sweep.py --help for options
+"""
+import os
+import sys
+import csv
+import random
+import argparse
+import itertools
+import multiprocessing
+from timeit import default_timer
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame as pyg
+import constants as con
+import stage as stages
+from objects import Ball
+from stage import PlayStage, TESTSTAGE
+
+# Swept parameters & their default values (TESTSTAGE's
+#   gravity and a new Ball's friction & proration)
+PARAMETERS = ("gravity", "friction", "proration")
+DEFAULTS = {"gravity": TESTSTAGE["GRAVITY"], "friction": 0.03, "proration": 2.0}
+
+# Columns of the results table
+COLUMNS = PARAMETERS + ("rest_frame", "bounces", "max_dx", "max_dy", "fps")
+
+def grid(values):
+    """
+    Returns every combination of the given parameter
+    values (a dict of lists keyed by PARAMETERS) as a
+    list of dicts
+    """
+    return [dict(zip(PARAMETERS, combo))
+            for combo in itertools.product(*[values[name] for name in PARAMETERS])]
+
+def sample(values, count, seed=0):
+    """
+    Returns count configurations with each parameter drawn
+    uniformly between the lowest & highest of its given
+    values
+    """
+    rng = random.Random(seed)
+    return [dict((name, rng.uniform(min(values[name]), max(values[name])))
+                 for name in PARAMETERS) for i in xrange(count)]
+
+def build_stage(config, balls, vectorized, seed=0):
+    """
+    Returns a PlayStage with config's gravity and balls
+    Balls dropped from rest at random spots (the same spots
+    for every configuration), with config's friction and
+    proration
+    """
+    rng = random.Random(seed)
+    width, height = pyg.image.load("img/ball.png").get_size()
+    bounds = dict(TESTSTAGE, GRAVITY=config["gravity"])
+    stage = PlayStage(bounds, vectorized)
+    for i in xrange(balls):
+        ball = Ball(stage, rng.randint(bounds["LEFT_WALL"], bounds["RIGHT_WALL"] - width),
+                    rng.randint(bounds["CEILING"], bounds["FLOOR"] - height))
+        ball.deltaX = 0
+        ball.friction = config["friction"]
+        ball.proration = config["proration"]
+        stage.add_object(ball)
+    return stage
+
+def deltas(stage):
+    """
+    Returns arrays of every stage object's deltas
+    """
+    engine = stage.engine
+    if engine is not None and engine.count == len(stage.objects):
+        n = engine.count
+        return engine.dx[:n], engine.dy[:n]
+    return (np.array([object.deltaX for object in stage.objects], dtype=float),
+            np.array([object.deltaY for object in stage.objects], dtype=float))
+
+def simulate(job):
+    """
+    Runs one configuration for the given number of frames
+    and returns its row of the results table. rest_frame
+    is the number of updates until every object stopped
+    changing (it is found once they have all fallen
+    asleep, SLEEP_FRAMES updates later), or None if they
+    never did
+    """
+    config, frames, balls, vectorized, seed = job
+    stage = build_stage(config, balls, vectorized, seed)
+    rest_frame = None
+    bounces = 0
+    max_dx = max_dy = 0.0
+    start = default_timer()
+    for frame in xrange(frames):
+        stage.update()
+        bounces += stage.bounces
+        dx, dy = deltas(stage)
+        max_dx = max(max_dx, float(np.abs(dx).max()))
+        max_dy = max(max_dy, float(np.abs(dy).max()))
+        if stage.asleep[:len(stage.objects)].all():
+            rest_frame = max(0, frame + 1 - stages.SLEEP_FRAMES)
+            break
+    elapsed = default_timer() - start
+    row = dict(config)
+    row.update({"rest_frame": rest_frame, "bounces": bounces, "max_dx": max_dx,
+                "max_dy": max_dy, "fps": (frame + 1) / elapsed if elapsed > 0 else float("inf")})
+    return row
+
+def init_worker():
+    """
+    Sets up pygame in a worker process (a display mode is
+    needed to convert images, and con.DEBUG's prediction
+    rects are never drawn)
+    """
+    con.DEBUG = False
+    pyg.init()
+    pyg.display.set_mode(con.SCREEN_SIZE)
+
+def run(configs, frames, balls, vectorized, processes=None, seed=0):
+    """
+    Simulates every configuration in a pool of processes
+    (one per core by default). Returns the rows of the
+    results table in configuration order
+    """
+    jobs = [(config, frames, balls, vectorized, seed) for config in configs]
+    pool = multiprocessing.Pool(processes, init_worker)
+    try:
+        rows = pool.map(simulate, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return rows
+
+def write_table(rows, log=sys.stdout):
+    """
+    Prints the results table with aligned columns
+    """
+    print >>log, "".join("%12s" % column for column in COLUMNS)
+    for row in rows:
+        cells = []
+        for column in COLUMNS:
+            value = row[column]
+            if value is None:
+                cells.append("%12s" % "-")
+            elif isinstance(value, float):
+                cells.append("%12.3f" % value)
+            else:
+                cells.append("%12d" % value)
+        print >>log, "".join(cells)
+
+def main():
+    """
+    Parses options, runs the sweep and prints & writes the
+    results table
+    """
+    parser = argparse.ArgumentParser(description="Gravity/friction/proration sweeps")
+    for name in PARAMETERS:
+        parser.add_argument("--" + name, type=float, nargs="+", default=[DEFAULTS[name]],
+                            help="%s values (default: %s)" % (name, DEFAULTS[name]))
+    parser.add_argument("--samples", type=int,
+                        help="run this many random configurations drawn between each "
+                             "parameter's lowest & highest value instead of the full grid")
+    parser.add_argument("--frames", type=int, default=1800,
+                        help="most frames simulated per configuration")
+    parser.add_argument("--balls", type=int, default=10, help="balls per configuration")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for ball placement & random sampling")
+    parser.add_argument("--objects", action="store_true",
+                        help="step Balls one at a time instead of with the physics engine")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--output", default="sweep.csv", help="results table to write")
+    args = parser.parse_args()
+
+    values = dict((name, getattr(args, name)) for name in PARAMETERS)
+    if args.samples is not None:
+        configs = sample(values, args.samples, args.seed)
+    else:
+        configs = grid(values)
+    rows = run(configs, args.frames, args.balls, not args.objects, args.processes, args.seed)
+    write_table(rows)
+    with open(args.output, "wb") as output:
+        writer = csv.DictWriter(output, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Tests for the component systems of stages. Run from the
+repository root with python -m unittest discover tests
+"""
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as pyg
+pyg.init()
+pyg.display.set_mode((1, 1))
+
+from components import BOUNCE, GRAVITY, INPUT
+from stage import PlayStage, TESTSTAGE
+from objects import Ball, GravityObject
+
+class SlipperyBall(Ball):
+    """
+    Ball without the friction component
+    """
+    __slots__ = ()
+
+    components = (GRAVITY, BOUNCE, INPUT)
+
+class ComponentSystemTest(unittest.TestCase):
+    """
+    Stage systems only act on objects with their component
+    """
+    def test_no_friction_component(self):
+        for vectorized in (False, True):
+            stage = PlayStage(TESTSTAGE, vectorized)
+            # Rolling along the floor, where a Ball's
+            #   friction would bring it to a halt
+            ball = SlipperyBall(stage, 100, 100)
+            ball.pushbox.bottom = stage.floor
+            ball.draw_rect.bottom = stage.floor
+            ball.deltaX = 3
+            ball.deltaY = 0
+            ball.can_bounce = False
+            stage.add_object(ball)
+            x = ball.pushbox.x
+            for frame in range(30):
+                stage.update()
+            self.assertEqual(ball.deltaX, 3)
+            self.assertEqual(ball.pushbox.x, x + 30 * 3)
+
+    def test_no_friction_or_bounce_component(self):
+        for vectorized in (False, True):
+            stage = PlayStage(TESTSTAGE, vectorized)
+            # Falls through the floor rather than bouncing
+            #   off it, moving sideways all the while
+            prop = GravityObject(stage)
+            prop.pushbox.bottom = stage.floor - 20
+            prop.draw_rect.bottom = stage.floor - 20
+            prop.deltaX = 2
+            prop.deltaY = 5
+            stage.add_object(prop)
+            for frame in range(10):
+                stage.update()
+            self.assertEqual(prop.deltaX, 2)
+            self.assertTrue(prop.deltaY > 5)
+            self.assertTrue(prop.pushbox.bottom > stage.floor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Tests for input logs. Run from the repository root with
+python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pygame as pyg
+
+from input import InputBus, InputEvent, InputRecorder, InputReplayer, LOG_HEADER, LOG_MAGIC
+
+class InputLogTest(unittest.TestCase):
+    """
+    Events recorded to an input log replay unchanged
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "input.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip_arrow_keys(self):
+        bus = InputBus()
+        bus.recorder = InputRecorder(self.path)
+        posted = [(3, pyg.KEYDOWN, pyg.K_UP), (3, pyg.KEYUP, pyg.K_LEFT),
+                  (7, pyg.KEYDOWN, pyg.K_RIGHT)]
+        for frame, event_type, key in posted:
+            bus.post(InputEvent(event_type, key))
+            bus.dispatch(frame)
+        bus.recorder.close()
+
+        replayed = []
+        bus = InputBus()
+        bus.replayer = InputReplayer(self.path)
+        bus.subscribe(lambda event: replayed.append((event.timestamp, event.type, event.key)),
+                      pyg.KEYDOWN)
+        bus.subscribe(lambda event: replayed.append((event.timestamp, event.type, event.key)),
+                      pyg.KEYUP)
+        for frame in range(10):
+            bus.dispatch(frame)
+        self.assertEqual(replayed, posted)
+
+    def test_rejects_version_1_logs(self):
+        with open(self.path, "wb") as log:
+            log.write(LOG_HEADER.pack(LOG_MAGIC, 1))
+        self.assertRaises(ValueError, InputReplayer, self.path)
+
+if __name__ == "__main__":
+    unittest.main()
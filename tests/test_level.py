@@ -0,0 +1,43 @@
+"""
+Tests for collisions with level tiles. Run from the
+repository root with python -m unittest discover tests
+"""
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as pyg
+pyg.init()
+pyg.display.set_mode((1, 1))
+
+import level
+from stage import PlayStage, TESTSTAGE
+from objects import Ball
+
+class TileLandingTest(unittest.TestCase):
+    """
+    Balls stop at whichever comes first, a solid tile or a
+    stage boundary
+    """
+    def test_tile_row_straddling_floor(self):
+        # 32 pixel tiles over the screen: the bottom row spans
+        #   576-608, across TESTSTAGE's floor (585)
+        lines = [""] * 18 + ["#" * 25]
+        top = 18 * 32
+        self.assertTrue(top < TESTSTAGE["FLOOR"] < top + 32)
+        for vectorized in (False, True):
+            stage = PlayStage(TESTSTAGE, vectorized)
+            stage.set_level(level.from_text(lines, 32))
+            # Falls over 10 pixels per update by the time it
+            #   reaches the tiles, enough to cross the floor
+            ball = Ball(stage, 300, 300)
+            ball.deltaX = 0
+            stage.add_object(ball)
+            for frame in range(1000):
+                stage.update()
+                self.assertTrue(ball.pushbox.bottom <= top,
+                                "ball sank to %d in frame %d" % (ball.pushbox.bottom, frame))
+            self.assertEqual(ball.pushbox.bottom, top)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Regression tests for PlayStage object removal. Run from
+the repository root with python -m unittest discover tests
+"""
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as pyg
+pyg.init()
+pyg.display.set_mode((1, 1))
+
+from stage import PlayStage, TESTSTAGE
+from objects import Ball, CollisionEvent
+
+def ball_state(ball):
+    pushbox = ball.pushbox
+    return (pushbox.x, pushbox.y, ball.deltaX, ball.deltaY, ball.can_bounce)
+
+class RemoveObjectTest(unittest.TestCase):
+    """
+    Removing an object drops the collisions queued with it
+    """
+    def stage_with_collision(self, vectorized):
+        """
+        Returns a stage holding two touching Balls with a
+        collision between them queued for next update
+        """
+        stage = PlayStage(TESTSTAGE, vectorized)
+        first = Ball(stage, 100, 100)
+        second = Ball(stage, 100 + first.pushbox.width, 100)
+        first.deltaX = 6
+        stage.add_object(first)
+        stage.add_object(second)
+        stage.queue_collision(CollisionEvent(first, second, 0, True, 1))
+        return stage, first, second
+
+    def lone_ball(self, vectorized):
+        """
+        Returns a stage holding only the second Ball of
+        stage_with_collision()
+        """
+        stage = PlayStage(TESTSTAGE, vectorized)
+        first = Ball(stage, 100, 100)
+        ball = Ball(stage, 100 + first.pushbox.width, 100)
+        stage.add_object(ball)
+        return stage, ball
+
+    def test_removed_ball_collision_not_resolved(self):
+        for vectorized in (False, True):
+            stage, first, second = self.stage_with_collision(vectorized)
+            stage.remove_object(first)
+            stage.update()
+            expected_stage, expected = self.lone_ball(vectorized)
+            expected_stage.update()
+            self.assertEqual(ball_state(second), ball_state(expected))
+            self.assertEqual(stage.queued_events(), [])
+
+    def test_save_restore_after_removal(self):
+        for vectorized in (False, True):
+            stage, first, second = self.stage_with_collision(vectorized)
+            stage.remove_object(first)
+            snapshot = stage.save_state()
+            state = ball_state(second)
+            stage.update()
+            stage.restore_state(snapshot)
+            self.assertEqual(ball_state(second), state)
+            self.assertEqual(stage.queued_events(), [])
+
+if __name__ == "__main__":
+    unittest.main()
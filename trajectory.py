@@ -0,0 +1,225 @@
+"""
+Module for predicting where Balls go over many updates to
+come: their paths, where they bounce and where they come to
+rest. Predictions step copies of the balls' physics arrays
+with the same rules as the physics engine (stage gravity,
+physics.step_bodies(), then physics.apply_friction()),
+every ball at once per update, so they match what the
+stage will do unless something the rules don't know about
+(another object, a push) gets in the way. A TrajectoryCache keeps each ball's
+prediction until that happens, serving later updates from
+the part of the path still ahead
+"""
+import numpy as np
+from physics import BodyArrays, apply_friction, apply_gravity, step_bodies
+
+# Updates ahead predicted by default (two seconds' worth)
+PREDICT_FRAMES = 120
+
+class Trajectory(object):
+    """
+    Predicted paths of a batch of balls over their next
+    updates: x[i, k] & y[i, k] hold ball i's pushbox
+    position after k updates (k = 0 being now),
+    bounced[i, k] whether update k stopped it short of its
+    move (a boundary or solid tile was hit), and
+    rest_frame[i] the update after which it no longer
+    changes at all (-1 if it still does within frames)
+    """
+    def __init__(self, x, y, bounced, rest_frame):
+        self.x = x
+        self.y = y
+        self.bounced = bounced
+        self.rest_frame = rest_frame
+
+    @property
+    def frames(self):
+        return self.x.shape[1] - 1
+
+    def bounce_points(self, i):
+        """
+        Returns the (update, x, y) of every bounce of
+        ball i, in order
+        """
+        frames = np.flatnonzero(self.bounced[i])
+        return list(zip(frames.tolist(), self.x[i, frames].tolist(), self.y[i, frames].tolist()))
+
+    def rest_positions(self):
+        """
+        Returns arrays of where each ball comes to rest
+        (NaN for balls still moving after frames updates)
+        """
+        rows = np.arange(len(self.rest_frame))
+        column = np.maximum(self.rest_frame, 0)
+        resting = self.rest_frame >= 0
+        return (np.where(resting, self.x[rows, column], np.nan),
+                np.where(resting, self.y[rows, column], np.nan))
+
+def predict(bodies, frames, gravity, floor, ceiling, left_wall, right_wall, level=None):
+    """
+    Returns the Trajectory of every body of a BodyArrays
+    over its next frames updates, stepping a copy of them
+    the way PlayStage.update() does. Collisions between
+    bodies aren't predicted
+    """
+    bodies = bodies.copy()
+    n = bodies.count
+    x = np.empty((n, frames + 1))
+    y = np.empty((n, frames + 1))
+    bounced = np.zeros((n, frames + 1), dtype=np.bool_)
+    rest_frame = np.full(n, -1, dtype=np.int64)
+    x[:, 0] = bodies.x[:n]
+    y[:, 0] = bodies.y[:n]
+    dx = bodies.dx[:n]
+    dy = bodies.dy[:n]
+    can_bounce = bodies.can_bounce[:n]
+
+    for k in range(1, frames + 1):
+        # Once every body is at rest, nothing moves again
+        if (rest_frame >= 0).all():
+            x[:, k:] = x[:, k - 1:k]
+            y[:, k:] = y[:, k - 1:k]
+            break
+        old = (dx.copy(), dy.copy(), can_bounce.copy())
+        apply_gravity(bodies, gravity)
+
+        # Where each body would end up if nothing were hit
+        free_x = np.trunc(x[:, k - 1] + dx)
+        free_y = np.trunc(y[:, k - 1] + dy)
+        step_bodies(bodies, floor, ceiling, left_wall, right_wall, level)
+        apply_friction(bodies)
+        x[:, k] = bodies.x[:n]
+        y[:, k] = bodies.y[:n]
+        bounced[:, k] = (x[:, k] != free_x) | (y[:, k] != free_y)
+
+        # A body whose update changed nothing is at rest
+        #   (the same state always steps the same way)
+        still = ((x[:, k] == x[:, k - 1]) & (y[:, k] == y[:, k - 1]) & (dx == old[0]) &
+                 (dy == old[1]) & (can_bounce == old[2]))
+        rest_frame[still & (rest_frame < 0)] = k - 1
+    return Trajectory(x, y, bounced, rest_frame)
+
+def gather(objects):
+    """
+    Returns a BodyArrays holding the current state of the
+    given Balls (read through their members, whether or
+    not a physics engine steps them)
+    """
+    bodies = BodyArrays(len(objects))
+    bodies.count = n = len(objects)
+    if not n:
+        return bodies
+    states = np.array([tuple(object.pushbox) + tuple(object.draw_rect) +
+                       (object.deltaX, object.deltaY, object.friction, object.proration,
+                        object.can_bounce, object.is_gravity)
+                       for object in objects], dtype=np.float64)
+    for k, name in enumerate(("x", "y", "w", "h", "rx", "ry", "rw", "rh",
+                              "dx", "dy", "friction", "proration")):
+        getattr(bodies, name)[:n] = states[:, k]
+    bodies.can_bounce[:n] = states[:, 12] != 0
+    bodies.is_gravity[:n] = states[:, 13] != 0
+    return bodies
+
+class TrajectoryCache(object):
+    """
+    Trajectories predicted for a stage's balls, kept per
+    ball along with the frame they were predicted at, and
+    served shifted by the updates since until invalidated
+    (see PlayStage.predict()). Predictions all hold for one
+    world (stage gravity, boundaries & level), given as a
+    key; a new key drops them all
+    """
+    def __init__(self):
+        self.key = None
+
+        # Per ball (by id): the ball, the frame its
+        #   prediction starts at, and the Trajectory & row
+        #   holding it
+        self.entries = {}
+
+    def check(self, key):
+        """
+        Drops every prediction if the world changed since
+        they were made
+        """
+        if key != self.key:
+            self.key = key
+            self.entries = {}
+
+    def clear(self):
+        """
+        Drops every prediction
+        """
+        self.entries = {}
+
+    def invalidate(self, objects):
+        """
+        Drops the predictions of the given balls
+        """
+        entries = self.entries
+        if entries:
+            for object in objects:
+                entries.pop(id(object), None)
+
+    def missing(self, objects, frame, frames):
+        """
+        Returns the given balls without a prediction that
+        covers the frames updates from frame on
+        """
+        entries = self.entries
+        missing = []
+        for object in objects:
+            entry = entries.get(id(object))
+            if (entry is None or entry[0] is not object or entry[1] > frame or
+                    frame - entry[1] + frames > entry[2].frames):
+                missing.append(object)
+        return missing
+
+    def store(self, objects, frame, trajectory):
+        """
+        Keeps a Trajectory predicted at frame for the given
+        balls (in row order)
+        """
+        entries = self.entries
+        for i, object in enumerate(objects):
+            entries[id(object)] = (object, frame, trajectory, i)
+
+    def get(self, objects, frame, frames):
+        """
+        Returns the Trajectory of the given balls over the
+        frames updates from frame on, all of which must be
+        covered (see missing())
+        """
+        n = len(objects)
+        x = np.empty((n, frames + 1))
+        y = np.empty((n, frames + 1))
+        bounced = np.empty((n, frames + 1), dtype=np.bool_)
+        rest_frame = np.empty(n, dtype=np.int64)
+
+        # Balls predicted together are copied together: per
+        #   Trajectory, the frame it starts at, and the
+        #   positions of its balls among objects & its rows
+        groups = {}
+        for i, object in enumerate(objects):
+            entry = self.entries[id(object)]
+            group = groups.get(id(entry[2]))
+            if group is None:
+                group = groups[id(entry[2])] = (entry[1], entry[2], [], [])
+            group[2].append(i)
+            group[3].append(entry[3])
+        for start, trajectory, positions, rows in groups.values():
+            k = frame - start
+            columns = slice(k, k + frames + 1)
+            x[positions] = trajectory.x[rows, columns]
+            y[positions] = trajectory.y[rows, columns]
+            bounced[positions] = trajectory.bounced[rows, columns]
+
+            # Shift rest frames by the updates since; balls
+            #   coming to rest after the last update covered
+            #   still move
+            rest = trajectory.rest_frame[rows]
+            shifted = rest - k
+            rest_frame[positions] = np.where((rest < 0) | (shifted > frames), -1,
+                                             np.maximum(shifted, 0))
+        bounced[:, 0] = False
+        return Trajectory(x, y, bounced, rest_frame)